@@ -1,3 +1,3 @@
-
-from . import models
+
+from . import models
 from . import controllers
\ No newline at end of file
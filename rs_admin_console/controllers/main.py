@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import hmac
+import json
+import logging
+
+from odoo import http
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+
+class UhuuGithubWebhook(http.Controller):
+
+    @http.route('/uhuu/github/webhook', type='http', auth='public', methods=['POST'], csrf=False)
+    def github_webhook(self, **kwargs):
+        cabeceras = request.httprequest.headers
+        cuerpo = request.httprequest.get_data()
+        secreto = request.env['res.config.settings'].sudo().get_github_settings()['webhook_secret']
+        if not secreto:
+            return request.make_json_response({'error': 'Webhook de GitHub no configurado'}, status=503)
+
+        # GitHub firma el cuerpo crudo con HMAC-SHA256 usando el secreto del webhook
+        esperada = 'sha256=' + hmac.new(secreto.encode(), cuerpo, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(cabeceras.get('X-Hub-Signature-256', ''), esperada):
+            _logger.warning("🔐 Webhook de GitHub con firma inválida desde %s", request.httprequest.remote_addr)
+            return request.make_json_response({'error': 'Firma inválida'}, status=401)
+
+        evento = cabeceras.get('X-GitHub-Event')
+        if evento == 'ping':
+            return request.make_json_response({'result': 'pong'})
+        if evento != 'push':
+            return request.make_json_response({'result': 'ignorado', 'event': evento})
+
+        try:
+            payload = json.loads(cuerpo)
+        except ValueError:
+            return request.make_json_response({'error': 'JSON inválido'}, status=400)
+
+        log = request.env['uhuu.github.commit.log'].sudo()._registrar_push(
+            payload, cabeceras.get('X-GitHub-Delivery'))
+        return request.make_json_response({'result': log.state, 'jobs': log.job_count})
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Mueve los cuerpos de respuesta guardados en texto plano al almacén deduplicado
+# uhuu.api.response.blob y elimina la columna antigua.
+import logging
+from collections import defaultdict
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+
+
+def _migrar_tabla(env, tabla):
+    cr = env.cr
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_name = %s AND column_name = 'response'
+    """, (tabla,))
+    if not cr.fetchone():
+        return
+
+    Blob = env['uhuu.api.response.blob']
+    migrados = 0
+    while True:
+        cr.execute(f"""
+            SELECT id, response FROM {tabla}
+             WHERE response IS NOT NULL AND response_blob_id IS NULL
+             LIMIT %s
+        """, (BATCH_SIZE,))
+        filas = cr.fetchall()
+        if not filas:
+            break
+        blob_ids = Blob._guardar([texto for _id, texto in filas])
+        ids_por_blob = defaultdict(list)
+        for rec_id, texto in filas:
+            ids_por_blob[blob_ids.get(texto)].append(rec_id)
+        for blob_id, rec_ids in ids_por_blob.items():
+            cr.execute(f"UPDATE {tabla} SET response_blob_id = %s, response = NULL WHERE id IN %s",
+                       (blob_id, tuple(rec_ids)))
+        migrados += len(filas)
+
+    cr.execute(f"ALTER TABLE {tabla} DROP COLUMN response")
+    _logger.info("📦 %s: %s respuestas movidas al almacén deduplicado", tabla, migrados)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    _migrar_tabla(env, 'uhuu_api_test_result')
+    _migrar_tabla(env, 'uhuu_api_endpoint')
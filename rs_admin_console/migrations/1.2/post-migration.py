@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Carga el resumen por hora con los resultados crudos que ya existían antes de la actualización;
+# a partir de aquí se alimenta solo al registrar cada lote.
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20000
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Hourly = env['uhuu.api.test.result.hourly']
+    cr.execute("SELECT 1 FROM uhuu_api_test_result_hourly LIMIT 1")
+    if cr.fetchone():
+        return
+
+    ultimo_id, total = 0, 0
+    while True:
+        cr.execute("SELECT id FROM uhuu_api_test_result WHERE id > %s ORDER BY id LIMIT %s",
+                   (ultimo_id, BATCH_SIZE))
+        ids = [row[0] for row in cr.fetchall()]
+        if not ids:
+            break
+        Hourly._acumular(ids)
+        ultimo_id = ids[-1]
+        total += len(ids)
+    _logger.info("📊 Resumen por hora cargado con %s resultados existentes", total)
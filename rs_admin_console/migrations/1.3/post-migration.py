@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Índices compuestos de uhuu_api_test_result. En tablas grandes init() no los crea para no bloquear
+# escrituras; se construyen con CREATE INDEX CONCURRENTLY desde una conexión aparte, que espera a
+# que se confirme la transacción de la actualización. Nadie espera a ese hilo: si el proceso termina
+# antes, el índice queda inválido o sin crear, y init() lo reconstruye (o lo avisa en el log) en la
+# siguiente actualización; también se puede relanzar crear_indices_concurrentes() desde odoo-bin shell.
+import logging
+import threading
+
+from odoo.addons.rs_admin_console.models.test_result import INDICES, crear_indices_concurrentes
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    cr.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'uhuu_api_test_result'")
+    existentes = {row[0] for row in cr.fetchall()}
+    if all(nombre in existentes for nombre in INDICES):
+        return
+    _logger.info("🗂️ Los índices de resultados se crearán de forma concurrente al terminar la actualización")
+    # No se puede esperar aquí (join): el CREATE INDEX CONCURRENTLY espera a esta misma transacción.
+    # Hilo no daemon para que un cierre normal del intérprete no lo corte a mitad
+    threading.Thread(target=crear_indices_concurrentes, args=(cr.dbname,),
+                     name='uhuu_indices_resultados').start()
+
@@ -1,10 +1,18 @@
-
-from . import api_end_point
-from . import api_environment
-from . import test_result
-from . import github_commit_log
-from . import rs_state_modules_customer
-from . import client_consola
-from . import res_config_settings
-from . import res_partner
-
+
+from . import response_blob
+from . import api_end_point
+from . import api_environment
+from . import test_result
+from . import test_result_daily
+from . import test_result_hourly
+from . import ai_explanation
+from . import latency_summary
+from . import github_commit_log
+from . import rs_state_modules_customer
+from . import client_consola
+from . import run_job
+from . import run_job_line
+from . import load_test
+from . import res_config_settings
+from . import res_partner
+
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class UhuuApiAiExplanation(models.Model):
+    _name = 'uhuu.api.ai.explanation'
+    _description = 'Explicación IA en caché por firma de error'
+    _order = 'last_used_at desc, id desc'
+    _rec_name = 'signature'
+
+    signature = fields.Char(string='Firma', required=True, readonly=True, index=True,
+                            help="SHA-256 del código de estado y el cuerpo normalizado (sin ids, fechas ni números)")
+    status_code = fields.Integer(readonly=True)
+    sample = fields.Text(string='Cuerpo normalizado', readonly=True)
+    comentario = fields.Text(string='Comentario IA', required=True)
+    hit_count = fields.Integer(string='Reutilizaciones', default=0, readonly=True)
+    last_used_at = fields.Datetime(string='Último uso', default=fields.Datetime.now, readonly=True)
+
+    _sql_constraints = [
+        ('signature_uniq', 'unique(signature)', 'Ya existe una explicación para esta firma de error.'),
+    ]
+
+    @api.model
+    def _buscar(self, firmas):
+        """Devuelve ``{firma: comentario}`` de las firmas ya explicadas y anota su reutilización."""
+        if not firmas:
+            return {}
+        self.env.cr.execute("""
+            UPDATE uhuu_api_ai_explanation
+               SET hit_count = hit_count + 1, last_used_at = now() AT TIME ZONE 'UTC'
+             WHERE signature IN %s
+         RETURNING signature, comentario
+        """, (tuple(firmas),))
+        encontradas = dict(self.env.cr.fetchall())
+        self.invalidate_model(['hit_count', 'last_used_at'])
+        return encontradas
+
+    @api.model
+    def _guardar(self, explicaciones):
+        """Guarda ``{firma: (status_code, muestra, comentario)}``; si otra transacción ya guardó la firma, se conserva."""
+        if not explicaciones:
+            return
+        for firma, (status_code, muestra, comentario) in explicaciones.items():
+            self.env.cr.execute("""
+                INSERT INTO uhuu_api_ai_explanation
+                    (signature, status_code, sample, comentario, hit_count, last_used_at,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, %s, 0, now() AT TIME ZONE 'UTC',
+                        %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC')
+                ON CONFLICT (signature) DO NOTHING
+            """, (firma, status_code, muestra, comentario, self.env.uid, self.env.uid))
+        self.invalidate_model()
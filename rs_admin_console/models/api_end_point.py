@@ -1,180 +1,526 @@
-# -*- coding: utf-8 -*-
-from odoo import fields, models, api, _
-import json
-import requests
-import logging
-import time  # Para calcular duración si se desea
-
-_logger = logging.getLogger(__name__)
-
-class UhuuApiEndpoint(models.Model):
-    _name = 'uhuu.api.endpoint'
-    _description = 'Endpoint Uhuu para pruebas automáticas'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
-
-    name = fields.Char(required=True)
-    method = fields.Selection(
-        [('GET', 'GET'), ('POST', 'POST'), ('PUT', 'PUT'), ('DELETE', 'DELETE')],
-        required=True
-    )
-    route = fields.Char(required=True, tracking=True)
-    body_json = fields.Text(string='Body JSON', tracking=True,
-                            help="Formato JSON. Se usará como cuerpo en métodos POST/PUT.")
-    headers = fields.Text(string='Cabeceras JSON', tracking=True,
-                          help='Cabeceras HTTP en formato JSON. Puedes incluir Authorization.')
-    query_params = fields.Text(string="Parámetros GET/DELETE JSON", tracking=True,
-                               help='Diccionario de parámetros URL (solo para GET y DELETE).')
-    active = fields.Boolean(default=True, tracking=True)
-    endpoint_id_padre = fields.Many2one(
-        'uhuu.api.endpoint', string='Endpoint de login', tracking=True)
-    test_result_ids = fields.One2many(
-        'uhuu.api.test.result', 'endpoint_id',
-        string='Resultados de prueba', tracking=True)
-    type_login = fields.Boolean(string="¿Es login?", tracking=True)
-    partner_id = fields.Many2one(
-        'res.partner', string='Cliente asociado',
-        help="Cliente asociado a este endpoint, si aplica", tracking=True)
-    response = fields.Text()
-    state = fields.Selection(
-        [('draft', 'Borrador'),
-         ('test_ok', 'Test OK'),
-         ('test_failed', 'Test Failed')],
-        default='draft', string='Estado', tracking=True)
-    date_last_test = fields.Datetime(string='Última Ejecución',
-                                     help="Fecha del último test realizado en este endpoint", tracking=True)
-    sequence = fields.Integer(
-        string='Secuencia',
-        help="Secuencia para ordenar los endpoints en las pruebas automáticas",
-        default=10, tracking=True)
-
-    def probar_endpoint(self, environment=None):
-        self.ensure_one()
-
-        if not environment:
-            environment = self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1)
-            if not environment:
-                raise ValueError("No hay entorno por defecto definido.")
-
-        # Autenticación previa si existe endpoint padre
-        token = None
-        if self.endpoint_id_padre:
-            response_login = self.endpoint_id_padre._ejecutar_llamada(environment)
-            try:
-                data = json.loads(response_login.get('response', '{}'))
-                token = data.get('access_token') or data.get('token')
-                if not token:
-                    raise ValueError("No se pudo obtener token del login asignado.")
-            except Exception as e:
-                _logger.warning("⚠️ No se pudo extraer token del login: %s", e)
-
-        # Ejecutar este endpoint con el token si se obtuvo
-        resultado = self._ejecutar_llamada(environment, token)
-
-        # Determinar partner de forma segura
-        partner = self.partner_id or self.endpoint_id_padre.partner_id if self.endpoint_id_padre else None
-
-        # Registrar resultado
-        self.env['uhuu.api.test.result'].create({
-            'endpoint_id': self.id,
-            'environment_id': environment.id,
-            'partner_id': partner.id if partner else False,
-            'status_code': resultado.get('status_code'),
-            'success': resultado.get('success'),
-            'response': resultado.get('response'),
-            'state': 'test_ok' if resultado.get('success') else 'test_failed',
-            # Agrega aquí 'duration': resultado.get('duration') si usas tiempo
-        })
-
-        # Actualiza estado y respuesta en el endpoint
-        self.response = resultado.get('response')
-        self.state = 'test_ok' if resultado.get('success') else 'test_failed'
-        self.date_last_test = fields.Datetime.now()
-
-        return resultado.get('success')
-
-    def _ejecutar_llamada(self, environment, token=None):
-        url = environment.base_url.rstrip('/') + '/' + self.route.lstrip('/')
-        method = self.method.upper()
-
-        # Headers
-        try:
-            headers = json.loads(self.headers or "{}")
-        except Exception as e:
-            headers = {}
-            _logger.warning("⚠️ Error al interpretar headers JSON: %s", e)
-
-        if token:
-            headers['Authorization'] = f"Bearer {token}"
-        elif environment.token:
-            headers['Authorization'] = f"Bearer {environment.token}"
-
-        # Body
-        try:
-            body = json.loads(self.body_json or "{}")
-        except Exception as e:
-            body = {}
-            _logger.warning("⚠️ Error al interpretar body JSON: %s", e)
-
-        # Query Params
-        try:
-            query_params = json.loads(self.query_params or "{}")
-        except Exception as e:
-            query_params = {}
-            _logger.warning("⚠️ Error al interpretar query_params JSON: %s", e)
-
-        # Validación preventiva para 'fields'
-        fields_list = query_params.get('fields', [])
-        if isinstance(fields_list, list):
-            for f in fields_list:
-                if isinstance(f, list):
-                    _logger.warning("⚠️ 'fields' contiene una lista anidada. Corrígelo para evitar errores 500.")
-                    query_params['fields'] = f
-                    break
-
-        # Logs debug
-        _logger.warning("📤 Método: %s", method)
-        _logger.warning("📤 URL: %s", url)
-        _logger.warning("📤 Headers: %s", headers)
-        _logger.warning("📦 Body: %s", body)
-        _logger.warning("🔎 Query Params: %s", query_params)
-
-        try:
-            start = time.time()
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=headers,
-                json=body if method in ['POST', 'PUT'] else None,
-                params={k: json.dumps(v) for k, v in query_params.items()} if method in ['GET', 'DELETE'] else None,
-                timeout=15
-            )
-            duration = time.time() - start
-            return {
-                'status_code': response.status_code,
-                'success': response.status_code < 400,
-                'response': response.text,
-                'duration': duration,
-            }
-        except Exception as e:
-            _logger.error("❌ Error al ejecutar llamada: %s", e)
-            return {
-                'status_code': 0,
-                'success': False,
-                'response': f"{type(e).__name__}: {str(e)}"
-            }
-
-    def ejecutar_pruebas_masivas(self):
-        endpoints = self.search([('active', '=', True)])
-        entorno_default = self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1)
-        for endpoint in endpoints:
-            try:
-                endpoint.probar_endpoint(environment=entorno_default)
-            except Exception as e:
-                _logger.error("❌ Error en prueba masiva para %s: %s", endpoint.name, e)
-                self.env['uhuu.api.test.result'].create({
-                    'endpoint_id': endpoint.id,
-                    'environment_id': entorno_default.id if entorno_default else False,
-                    'status_code': 0,
-                    'success': False,
-                    'response': f"{type(e).__name__}: {str(e)}",
-                })
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api, _
+from odoo.exceptions import ValidationError
+import requests
+import hashlib
+import logging
+import time  # Para calcular duración si se desea
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ..tools import circuit_breaker, http_pool, request_log, request_plan, token_cache
+
+_logger = logging.getLogger(__name__)
+
+# Campos que definen la petición HTTP; al cambiar alguno se descarta lo cacheado del endpoint
+CAMPOS_PETICION = {'method', 'route', 'body_json', 'headers', 'query_params', 'active', 'type_login'}
+
+# Tamaño de lectura del cuerpo de la respuesta en streaming
+CHUNK_RESPUESTA = 64 * 1024
+
+# Contexto de las ejecuciones en lote: sin valores de tracking ni mensajes automáticos en el chatter;
+# cada ejecución deja un único resumen (y un mensaje por endpoint solo si cambia su estado)
+CONTEXTO_LOTE = {
+    'tracking_disable': True,
+    'mail_notrack': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+}
+
+
+class UhuuApiEndpoint(models.Model):
+    _name = 'uhuu.api.endpoint'
+    _description = 'Endpoint Uhuu para pruebas automáticas'
+    _inherit = ['mail.thread', 'mail.activity.mixin']
+
+    name = fields.Char(required=True)
+    method = fields.Selection(
+        [('GET', 'GET'), ('POST', 'POST'), ('PUT', 'PUT'), ('DELETE', 'DELETE')],
+        required=True
+    )
+    route = fields.Char(required=True, tracking=True)
+    body_json = fields.Text(string='Body JSON', tracking=True,
+                            help="Formato JSON. Se usará como cuerpo en métodos POST/PUT.")
+    headers = fields.Text(string='Cabeceras JSON', tracking=True,
+                          help='Cabeceras HTTP en formato JSON. Puedes incluir Authorization.')
+    query_params = fields.Text(string="Parámetros GET/DELETE JSON", tracking=True,
+                               help='Diccionario de parámetros URL (solo para GET y DELETE).')
+    active = fields.Boolean(default=True, tracking=True)
+    endpoint_id_padre = fields.Many2one(
+        'uhuu.api.endpoint', string='Endpoint de login', tracking=True)
+    test_result_ids = fields.One2many(
+        'uhuu.api.test.result', 'endpoint_id',
+        string='Resultados de prueba', tracking=True)
+    type_login = fields.Boolean(string="¿Es login?", tracking=True)
+    max_response_bytes = fields.Integer(
+        string='Tamaño máximo guardado (bytes)', default=65536, tracking=True,
+        help="De las respuestas correctas solo se guarda este inicio, junto con el tamaño total y el hash "
+             "del cuerpo completo. Las fallidas y las de login se guardan completas. 0 = sin límite.")
+    keep_full_response = fields.Boolean(
+        string='Guardar respuesta completa', tracking=True,
+        help="Guarda siempre el cuerpo completo, aunque supere el tamaño máximo.")
+    partner_id = fields.Many2one(
+        'res.partner', string='Cliente asociado',
+        help="Cliente asociado a este endpoint, si aplica", tracking=True)
+    latency_summary_ids = fields.One2many(
+        'uhuu.api.latency.summary', 'endpoint_id', string='Latencia por entorno')
+    latency_p95 = fields.Float(
+        string='Latencia p95 (s)', compute='_compute_latency_p95', digits=(16, 3),
+        help="p95 reciente más alto entre los entornos del endpoint")
+    response_blob_id = fields.Many2one(
+        'uhuu.api.response.blob', string='Cuerpo de respuesta', readonly=True, index=True, ondelete='restrict')
+    response = fields.Text(compute='_compute_response', inverse='_inverse_response')
+    state = fields.Selection(
+        [('draft', 'Borrador'),
+         ('test_ok', 'Test OK'),
+         ('test_failed', 'Test Failed'),
+         ('test_blocked', 'Bloqueado')],
+        default='draft', string='Estado', tracking=True)
+    date_last_test = fields.Datetime(string='Última Ejecución',
+                                     help="Fecha del último test realizado en este endpoint", tracking=True)
+    sequence = fields.Integer(
+        string='Secuencia',
+        help="Secuencia para ordenar los endpoints en las pruebas automáticas",
+        default=10, tracking=True)
+    plan_version = fields.Integer(
+        default=0, copy=False,
+        help="Se incrementa al cambiar la definición de la petición para invalidar el plan compilado")
+    plan_changed_at = fields.Datetime(
+        string='Definición modificada', readonly=True, copy=False,
+        help="Último cambio de la petición; las ejecuciones incrementales vuelven a probar el endpoint")
+
+    def probar_endpoint(self, environment=None):
+        self.ensure_one()
+
+        if not environment:
+            environment = self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1)
+            if not environment:
+                raise ValueError("No hay entorno por defecto definido.")
+
+        # Autenticación previa si existe endpoint padre
+        token = None
+        if self.endpoint_id_padre:
+            token, response_login = self.endpoint_id_padre._obtener_token(environment)
+            if not token:
+                _logger.warning("⚠️ No se pudo extraer token del login: %s", response_login.get('token_error'))
+
+        # Ejecutar este endpoint con el token si se obtuvo
+        resultado = self._ejecutar_llamada(environment, token)
+        if self.type_login and resultado.get('success'):
+            # El propio test del login deja el token en caché para sus endpoints hijos
+            self._guardar_token(environment, resultado)
+
+        # Determinar partner de forma segura
+        partner = self.partner_id or self.endpoint_id_padre.partner_id if self.endpoint_id_padre else None
+
+        # Registrar resultado
+        TestResult = self.env['uhuu.api.test.result']
+        TestResult._registrar_resultados([TestResult._preparar_vals(self, environment, partner, resultado)])
+
+        # Actualiza estado y respuesta en el endpoint
+        self.response = resultado.get('response')
+        self.state = 'test_ok' if resultado.get('success') else 'test_failed'
+        self.date_last_test = fields.Datetime.now()
+
+        return resultado.get('success')
+
+    @api.depends('latency_summary_ids.latency_p95')
+    def _compute_latency_p95(self):
+        for rec in self:
+            rec.latency_p95 = max(rec.latency_summary_ids.mapped('latency_p95') or [0.0])
+
+    def action_ver_latencia(self):
+        self.ensure_one()
+        return self.env['uhuu.api.test.result']._accion_tendencia_latencia(
+            [('endpoint_id', '=', self.id)], _('Latencia: %s') % self.name)
+
+    @api.depends('response_blob_id')
+    def _compute_response(self):
+        for rec in self:
+            rec.response = rec.response_blob_id.texto
+
+    def _inverse_response(self):
+        blob_ids = self.env['uhuu.api.response.blob']._guardar(self.mapped('response'))
+        for rec in self:
+            rec.response_blob_id = blob_ids.get(rec.response) or False
+
+    def _obtener_token(self, environment):
+        """Token del login para ``environment``, servido desde caché mientras no esté por expirar.
+
+        Devuelve ``(token, resultado_login)``. ``resultado_login`` es None si no hizo falta llamar
+        al login; si no se pudo extraer el token, el motivo queda en ``resultado_login['token_error']``.
+        """
+        self.ensure_one()
+        settings = self.env['res.config.settings'].get_api_settings()
+        clave = token_cache.clave(self.env.cr.dbname, self.id, environment.id)
+        token = token_cache.obtener(clave, margen=settings['token_refresh_margin'])
+        if token:
+            return token, None
+        resultado = self._ejecutar_llamada(environment)
+        return self._guardar_token(environment, resultado), resultado
+
+    def _guardar_token(self, environment, resultado):
+        self.ensure_one()
+        settings = self.env['res.config.settings'].get_api_settings()
+        try:
+            token, expira_en = token_cache.extraer_token(resultado.get('response'), settings['token_ttl'])
+        except Exception as e:
+            resultado['token_error'] = str(e)
+            return None
+        token_cache.guardar(token_cache.clave(self.env.cr.dbname, self.id, environment.id), token, expira_en)
+        return token
+
+    def _invalidar_tokens(self, environment=None):
+        token_cache.invalidar(
+            self.env.cr.dbname,
+            login_endpoint_ids=set(self.ids),
+            environment_ids={environment.id} if environment else None,
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        return super().create(self.env['uhuu.api.response.blob']._vals_con_blob(vals_list))
+
+    def write(self, vals):
+        if 'response' in vals:
+            vals = self.env['uhuu.api.response.blob']._vals_con_blob([dict(vals)])[0]
+        cambia_peticion = bool(CAMPOS_PETICION.intersection(vals))
+        if cambia_peticion:
+            self._invalidar_tokens()
+        res = super().write(vals)
+        if cambia_peticion and self.ids:
+            # La nueva versión invalida los planes cacheados también en los demás workers
+            self.env.cr.execute(
+                "UPDATE uhuu_api_endpoint SET plan_version = plan_version + 1, "
+                "plan_changed_at = now() AT TIME ZONE 'UTC' WHERE id IN %s",
+                (tuple(self.ids),))
+            self.invalidate_recordset(['plan_version', 'plan_changed_at'])
+            request_plan.descartar(self.env.cr.dbname, self.ids)
+        return res
+
+    def unlink(self):
+        self._invalidar_tokens()
+        request_plan.descartar(self.env.cr.dbname, self.ids)
+        return super().unlink()
+
+    def _ejecutar_llamada(self, environment, token=None):
+        return _enviar_llamada(self._preparar_llamada(environment, token))
+
+    def _get_plan(self):
+        # Plan compilado una sola vez por proceso y por versión de la definición del endpoint
+        self.ensure_one()
+        return request_plan.obtener(
+            self.env.cr.dbname, self.id, self.plan_version,
+            lambda: request_plan.compilar(self.method, self.route, self.headers, self.body_json, self.query_params),
+        )
+
+    def _valores_placeholders(self, plan, environment):
+        partner = self.partner_id or self.endpoint_id_padre.partner_id
+        registros = {'partner': partner, 'environment': environment}
+        valores = {}
+        for raiz, campo in plan.placeholders:
+            registro = registros.get(raiz)
+            valor = registro[campo] if registro and campo in registro._fields else ''
+            if isinstance(valor, models.BaseModel):
+                valor = valor.display_name
+            valores[(raiz, campo)] = '' if valor is False else valor
+        return valores
+
+    def _preparar_llamada(self, environment, token=None):
+        # Lee del ORM todo lo necesario para que el envío pueda hacerse fuera del hilo principal
+        self.ensure_one()
+        plan = self._get_plan()
+        valores = self._valores_placeholders(plan, environment) if plan.placeholders else None
+        peticion = request_plan.resolver(plan, environment.base_url, valores)
+
+        if token:
+            peticion['headers']['Authorization'] = f"Bearer {token}"
+        elif environment.token:
+            peticion['headers']['Authorization'] = f"Bearer {environment.token}"
+
+        # Log DEBUG muestreado y redactado: sin coste de formateo si no está activo
+        if request_log.habilitado() and request_log.en_muestra(
+                self.env['res.config.settings'].get_api_settings()['request_log_sample']):
+            request_log.peticion(peticion)
+            peticion['registrar'] = True
+
+        peticion['session'] = environment._get_http_session()
+        peticion['timeout'] = environment._get_timeouts(self)
+        peticion['circuito'] = environment._get_circuito()
+        # El login necesita el cuerpo completo para extraer el token
+        peticion['limite_bytes'] = 0 if self.keep_full_response or self.type_login else self.max_response_bytes
+        return peticion
+
+    @api.constrains('endpoint_id_padre')
+    def _check_endpoint_padre(self):
+        if not self._check_recursion(parent='endpoint_id_padre'):
+            raise ValidationError(_("Un endpoint no puede depender de sí mismo a través de sus logins."))
+
+    @api.constrains('method', 'route', 'headers', 'body_json', 'query_params')
+    def _check_plan_peticion(self):
+        for rec in self:
+            plan = request_plan.compilar(rec.method, rec.route, rec.headers, rec.body_json, rec.query_params)
+            errores = list(plan.errores)
+            for raiz, campo in sorted(plan.placeholders):
+                modelo = {'partner': 'res.partner', 'environment': 'uhuu.api.environment'}.get(raiz)
+                if modelo and campo not in self.env[modelo]._fields:
+                    errores.append(f"El campo '{campo}' no existe en {modelo} ({{{{{raiz}.{campo}}}}}).")
+            if errores:
+                raise ValidationError(_("Endpoint '%s':\n%s") % (rec.name, "\n".join(errores)))
+
+    def ejecutar_pruebas_masivas(self, max_workers=None):
+        # Grafo de dependencias por ejecución: cada login se llama una sola vez y sus hijos
+        # arrancan en cuanto su token está disponible; si el login falla, su subárbol queda bloqueado
+        endpoints = self.search([('active', '=', True)])
+        entorno_default = self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1)
+        if not entorno_default:
+            raise ValueError("No hay entorno por defecto definido.")
+        max_workers = max_workers or self.env['res.config.settings'].get_api_settings()['max_workers']
+
+        resultados, peticiones, padres, externos = {}, {}, {}, {}
+        for endpoint in endpoints:
+            padre = endpoint.endpoint_id_padre
+            token = None
+            if padre and padre not in endpoints:
+                # Login fuera de la ejecución (p. ej. archivado): su token se resuelve una sola vez
+                if padre.id not in externos:
+                    externos[padre.id] = padre._obtener_token(entorno_default)[0]
+                token = externos[padre.id]
+                if not token:
+                    resultados[endpoint.id] = {'status_code': 0, 'success': False, 'blocked_by': padre.id}
+                    continue
+            try:
+                peticiones[endpoint.id] = endpoint._preparar_llamada(entorno_default, token=token)
+            except Exception as e:
+                _logger.error("❌ Error en prueba masiva para %s: %s", endpoint.name, e)
+                resultados[endpoint.id] = {
+                    'status_code': 0,
+                    'success': False,
+                    'response': f"{type(e).__name__}: {str(e)}",
+                }
+                continue
+            padres[endpoint.id] = padre.id if padre in endpoints else None
+
+        logins = {ep.id for ep in endpoints if ep.type_login}
+        resultados.update(ejecutar_grafo_llamadas(
+            peticiones, padres,
+            lambda nodo, resultado: self.browse(nodo)._guardar_token(entorno_default, resultado),
+            proveedores=logins | {padre for padre in padres.values() if padre},
+            max_workers=max_workers,
+        ))
+
+        TestResult = self.env['uhuu.api.test.result']
+        resultados_pendientes = []
+        por_estado = defaultdict(list)
+        cambios = []
+        for endpoint in endpoints.with_context(**CONTEXTO_LOTE):
+            resultado = resultados[endpoint.id]
+            if 'blocked_by' in resultado:
+                login = self.browse(resultado['blocked_by'])
+                resultado['response'] = (
+                    f"Bloqueado: el login '{login.name}' falló o no devolvió token; la llamada no se envió.")
+            partner = endpoint.partner_id or endpoint.endpoint_id_padre.partner_id if endpoint.endpoint_id_padre else None
+            vals = TestResult._preparar_vals(endpoint, entorno_default, partner, resultado)
+            resultados_pendientes.append(vals)
+            if endpoint.state != vals['state']:
+                cambios.append((endpoint, endpoint.state))
+            por_estado[vals['state']].append((endpoint.id, vals['response']))
+        TestResult._registrar_resultados(resultados_pendientes)
+
+        # Estado, fecha y respuesta en una escritura por (estado, cuerpo), sin tracking; los cuerpos se
+        # guardan todos de una vez y solo se avisa de los cambios de estado
+        blob_ids = self.env['uhuu.api.response.blob']._guardar(
+            [texto for pares in por_estado.values() for _id, texto in pares])
+        grupos = defaultdict(list)
+        for state, pares in por_estado.items():
+            for endpoint_id, texto in pares:
+                grupos[(state, blob_ids.get(texto) or False)].append(endpoint_id)
+        ahora = fields.Datetime.now()
+        for (state, blob_id), ids in grupos.items():
+            self.browse(ids).with_context(**CONTEXTO_LOTE).write(
+                {'state': state, 'date_last_test': ahora, 'response_blob_id': blob_id})
+        etiquetas = dict(self._fields['state']._description_selection(self.env))
+        for endpoint, anterior in cambios:
+            endpoint.message_post(body=(
+                f"🔁 Estado: {etiquetas.get(anterior, anterior)} → {etiquetas[endpoint.state]}"
+            ))
+
+
+def _leer_respuesta(response, limite_bytes=0):
+    """Lee el cuerpo en streaming y devuelve ``(texto, tamaño, hash, truncada)``.
+
+    Solo conserva en memoria los primeros ``limite_bytes`` de las respuestas correctas; el resto se
+    descarga para calcular tamaño y SHA-256 y se descarta. Con ``limite_bytes`` 0 o una respuesta de
+    error (>= 400) se conserva el cuerpo completo.
+    """
+    if response.status_code >= 400:
+        limite_bytes = 0
+    sha = hashlib.sha256()
+    partes, guardados, total = [], 0, 0
+    for chunk in response.iter_content(chunk_size=CHUNK_RESPUESTA):
+        sha.update(chunk)
+        total += len(chunk)
+        if not limite_bytes:
+            partes.append(chunk)
+        elif guardados < limite_bytes:
+            partes.append(chunk[:limite_bytes - guardados])
+            guardados += len(partes[-1])
+    truncada = bool(limite_bytes) and total > limite_bytes
+    # errors='replace': el corte puede caer a mitad de un carácter multibyte
+    texto = b''.join(partes).decode(response.encoding or 'utf-8', errors='replace')
+    return texto, total, sha.hexdigest(), truncada
+
+
+def _enviar_llamada(peticion, timeout=15, limite=None):
+    # Sin acceso al ORM: puede ejecutarse desde un hilo del pool de trabajo
+    peticion = dict(peticion)
+    session = peticion.pop('session', None) or requests
+    # (connect, read) del entorno si vienen en la petición; ``limite`` los recorta al tiempo restante
+    timeout = peticion.pop('timeout', None) or timeout
+    if limite:
+        timeout = tuple(min(t, limite) for t in timeout) if isinstance(timeout, tuple) else min(timeout, limite)
+    circuito = peticion.pop('circuito', None)  # (clave, umbral, cooldown)
+    registrar = peticion.pop('registrar', False)
+    limite_bytes = peticion.pop('limite_bytes', 0)
+    if circuito and not circuit_breaker.permitir(circuito[0]):
+        return {
+            'status_code': 0,
+            'success': False,
+            'response': "Circuito abierto: el entorno acumula fallos de conexión consecutivos, "
+                        "la llamada no se envió.",
+        }
+    try:
+        http_pool.iniciar_medicion()
+        start = time.time()
+        # stream=True separa la espera de cabeceras (TTFB) de la descarga del cuerpo
+        response = session.request(timeout=timeout, stream=True, **peticion)
+        cabeceras = time.time()
+        texto, tamano, hash_cuerpo, truncada = _leer_respuesta(response, limite_bytes)
+        fin = time.time()
+        if circuito:
+            circuit_breaker.registrar_exito(circuito[0])
+        fases = http_pool.fases_medidas()
+        resultado = {
+            'status_code': response.status_code,
+            'success': response.status_code < 400,
+            'response': texto,
+            'response_size': tamano,
+            'response_hash': hash_cuerpo,
+            'response_truncated': truncada,
+            'duration': fin - start,
+            'timing_connect': fases['connect'],
+            'timing_tls': fases['tls'],
+            'timing_ttfb': max(cabeceras - start - fases['connect'] - fases['tls'], 0.0),
+            'timing_transfer': fin - cabeceras,
+        }
+        if registrar:
+            request_log.respuesta(peticion, resultado)
+        return resultado
+    except Exception as e:
+        _logger.error("❌ Error al ejecutar llamada: %s", e)
+        if circuito and isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            circuit_breaker.registrar_fallo(*circuito)
+        elif circuito:
+            # Cuerpo cortado, redirecciones, decodificación...: fuera de la llamada de prueba no suman
+            # fallos; si era la llamada de prueba del circuito semiabierto, cuenta como fallida y lo reabre
+            circuit_breaker.cancelar_sonda(*circuito)
+        return {
+            'status_code': 0,
+            'success': False,
+            'response': f"{type(e).__name__}: {str(e)}"
+        }
+
+
+def _enviar_antes_de(peticion, deadline=None, timeout=15):
+    # Las peticiones que no empezaron antes de ``deadline`` (epoch) se dan por fallidas sin enviarse,
+    # y el timeout de las que sí se envían se recorta al tiempo que quede
+    limite = None
+    if deadline:
+        limite = deadline - time.time()
+        if limite <= 0:
+            return {
+                'status_code': 0,
+                'success': False,
+                'response': "Tiempo máximo de la ejecución agotado: la llamada no se envió.",
+            }
+        limite = max(limite, 1)
+    return _enviar_llamada(peticion, timeout=timeout, limite=limite)
+
+
+def ejecutar_llamadas_concurrentes(peticiones, max_workers=1, deadline=None, timeout=15):
+    """Envía las peticiones ya preparadas y devuelve los resultados en el mismo orden.
+
+    Con ``max_workers`` <= 1 se envían en serie; si no, con un pool de hilos acotado.
+    """
+    def enviar(peticion):
+        return _enviar_antes_de(peticion, deadline, timeout)
+
+    if max_workers <= 1 or len(peticiones) <= 1:
+        return [enviar(peticion) for peticion in peticiones]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(peticiones))) as executor:
+        return list(executor.map(enviar, peticiones))
+
+
+def ejecutar_grafo_llamadas(peticiones, padres, obtener_token, proveedores=None,
+                            max_workers=1, deadline=None, timeout=15):
+    """Ejecuta peticiones que dependen del token de su nodo padre y devuelve ``{nodo: resultado}``.
+
+    ``padres`` indica el padre de cada nodo (None para las raíces). Al terminar con éxito un nodo de
+    ``proveedores`` (por defecto, los que tienen hijos) se llama ``obtener_token(nodo, resultado)``
+    en el hilo principal y sus hijos se lanzan de inmediato con ese token. Si el nodo falla o no hay
+    token, todo su subárbol se devuelve como bloqueado (``blocked_by``) sin enviarse.
+    """
+    hijos = defaultdict(list)
+    for nodo, padre in padres.items():
+        if padre is not None:
+            hijos[padre].append(nodo)
+    if proveedores is None:
+        proveedores = set(hijos)
+    resultados, tokens = {}, {}
+
+    def bloquear(nodo, origen):
+        for hijo in hijos.get(nodo, []):
+            resultados[hijo] = {'status_code': 0, 'success': False, 'blocked_by': origen}
+            bloquear(hijo, origen)
+
+    def con_token(nodo):
+        peticion = peticiones[nodo]
+        padre = padres.get(nodo)
+        if padre is None:
+            return peticion
+        return dict(peticion, headers=dict(peticion['headers'], Authorization=f"Bearer {tokens[padre]}"))
+
+    # Hijos cuyo padre no llega a ejecutarse (falló al prepararse o quedó bloqueado antes)
+    for nodo, padre in padres.items():
+        if padre is not None and padre not in peticiones and nodo not in resultados:
+            resultados[nodo] = {'status_code': 0, 'success': False, 'blocked_by': padre}
+            bloquear(nodo, padre)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(peticiones) or 1))) as executor:
+        pendientes = {
+            executor.submit(_enviar_antes_de, con_token(nodo), deadline, timeout): nodo
+            for nodo in peticiones if padres.get(nodo) is None
+        }
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                nodo = pendientes.pop(futuro)
+                resultado = resultados[nodo] = futuro.result()
+                if nodo not in proveedores:
+                    continue
+                token = obtener_token(nodo, resultado) if resultado.get('success') else None
+                if token:
+                    tokens[nodo] = token
+                    for hijo in hijos.get(nodo, []):
+                        pendientes[executor.submit(_enviar_antes_de, con_token(hijo), deadline, timeout)] = hijo
+                else:
+                    bloquear(nodo, nodo)
+
+    # Lo que quede sin resultado está en un ciclo de endpoint_id_padre
+    for nodo in peticiones:
+        resultados.setdefault(nodo, {
+            'status_code': 0,
+            'success': False,
+            'response': "Dependencia circular entre endpoints: la llamada no se envió.",
+        })
+    return resultados
@@ -1,10 +1,98 @@
-from odoo import models, fields
-
-class UhuuApiEnvironment(models.Model):
-    _name = 'uhuu.api.environment'
-    _description = 'Entorno de pruebas Uhuu'
-
-    name = fields.Char(required=True)
-    base_url = fields.Char(required=True)
-    token = fields.Char()
-    default = fields.Boolean(default=False)
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+
+from ..tools import circuit_breaker, http_pool, token_cache
+
+# El timeout adaptativo solo se aplica con suficiente historial y nunca baja de este mínimo
+MIN_MUESTRAS_TIMEOUT = 20
+MIN_READ_TIMEOUT = 2.0
+
+
+class UhuuApiEnvironment(models.Model):
+    _name = 'uhuu.api.environment'
+    _description = 'Entorno de pruebas Uhuu'
+
+    name = fields.Char(required=True)
+    base_url = fields.Char(required=True)
+    token = fields.Char()
+    default = fields.Boolean(default=False)
+    connect_timeout = fields.Float(
+        string='Timeout de conexión (s)', default=5.0,
+        help="Tiempo máximo para establecer la conexión TCP/TLS con el entorno.")
+    read_timeout = fields.Float(
+        string='Timeout de lectura (s)', default=15.0,
+        help="Tiempo máximo de espera de la respuesta. Con timeout adaptativo es el tope.")
+    adaptive_timeout = fields.Boolean(
+        string='Timeout adaptativo', default=True,
+        help="Usa como timeout de lectura el p99 reciente de cada endpoint multiplicado por el factor.")
+    adaptive_timeout_factor = fields.Float(string='Factor sobre p99', default=3.0)
+    breaker_threshold = fields.Integer(
+        string='Fallos para abrir el circuito', default=5,
+        help="Fallos de conexión consecutivos tras los que las llamadas al entorno fallan al momento. "
+             "0 desactiva el circuit breaker.")
+    breaker_cooldown = fields.Integer(
+        string='Espera del circuito abierto (s)', default=60,
+        help="Pasado este tiempo se deja pasar una llamada de prueba antes de cerrar el circuito.")
+    breaker_state = fields.Selection([
+        (circuit_breaker.CERRADO, 'Cerrado'),
+        (circuit_breaker.ABIERTO, 'Abierto'),
+        (circuit_breaker.SEMIABIERTO, 'Semiabierto'),
+    ], string='Circuito', compute='_compute_breaker_state',
+        help="Estado del circuit breaker en este proceso del servidor.")
+
+    @api.constrains('connect_timeout', 'read_timeout', 'adaptive_timeout_factor', 'breaker_threshold', 'breaker_cooldown')
+    def _check_timeouts(self):
+        for rec in self:
+            if rec.connect_timeout <= 0 or rec.read_timeout <= 0:
+                raise ValidationError(_("Los timeouts de conexión y lectura deben ser mayores que cero."))
+            if rec.adaptive_timeout_factor < 1:
+                raise ValidationError(_("El factor del timeout adaptativo no puede ser menor que 1."))
+            if rec.breaker_threshold < 0 or rec.breaker_cooldown < 0:
+                raise ValidationError(_("Los valores del circuit breaker no pueden ser negativos."))
+
+    def _compute_breaker_state(self):
+        for rec in self:
+            rec.breaker_state = circuit_breaker.estado(http_pool.clave_entorno(self.env.cr.dbname, rec.id))
+
+    def _get_timeouts(self, endpoint):
+        """``(connect, read)`` para una llamada de ``endpoint`` contra este entorno."""
+        self.ensure_one()
+        read = self.read_timeout
+        if self.adaptive_timeout:
+            resumen = endpoint.latency_summary_ids.filtered(lambda r: r.environment_id == self)[:1]
+            if resumen.sample_count >= MIN_MUESTRAS_TIMEOUT and resumen.latency_p99:
+                read = min(read, max(resumen.latency_p99 * self.adaptive_timeout_factor, MIN_READ_TIMEOUT))
+        return (self.connect_timeout, read)
+
+    def _get_circuito(self):
+        self.ensure_one()
+        if not self.breaker_threshold:
+            return None
+        return (http_pool.clave_entorno(self.env.cr.dbname, self.id), self.breaker_threshold, self.breaker_cooldown)
+
+    def _get_http_session(self):
+        # Sesión keep-alive reutilizada por todas las llamadas contra este entorno
+        self.ensure_one()
+        settings = self.env['res.config.settings'].get_api_settings()
+        # Nunca menos conexiones que hilos concurrentes, para no descartar conexiones del pool
+        pool_maxsize = max(settings['pool_maxsize'], settings['max_workers'])
+        return http_pool.get_session(http_pool.clave_entorno(self.env.cr.dbname, self.id), pool_maxsize)
+
+    def _descartar_sesiones_http(self):
+        for rec in self:
+            http_pool.descartar(http_pool.clave_entorno(self.env.cr.dbname, rec.id))
+
+    def write(self, vals):
+        self._descartar_sesiones_http()
+        token_cache.invalidar(self.env.cr.dbname, environment_ids=set(self.ids))
+        return super().write(vals)
+
+    def unlink(self):
+        self._descartar_sesiones_http()
+        token_cache.invalidar(self.env.cr.dbname, environment_ids=set(self.ids))
+        return super().unlink()
+
+    def action_descartar_conexiones(self):
+        self._descartar_sesiones_http()
+        for rec in self:
+            circuit_breaker.reiniciar(http_pool.clave_entorno(self.env.cr.dbname, rec.id))
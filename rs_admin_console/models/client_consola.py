@@ -1,418 +1,614 @@
-# -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
-from datetime import datetime
-import json
-from odoo.exceptions import UserError
-import requests
-import base64
-
-import logging
-
-_logger = logging.getLogger(__name__)
-
-
-class ClientConsola(models.Model):
-    _name = 'client.consola'
-    _description = 'Consola de Cliente - Uhuu y GitHub'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
-
-    name = fields.Char(string='Nombre', tracking=True,)
-    partner_id = fields.Many2one(
-        'res.partner', string='Cliente', required=True, tracking=True,)
-
-    date_last_check_api = fields.Datetime(string='Último check API')
-    status_last_check_api = fields.Selection([
-        ('pending', 'Pendiente'),
-        ('success', 'Test OK'),
-        ('failed', 'Test Failed'),
-    ], string='Estatus Último Check APIs')
-    percentage_passed_api = fields.Float(string='Porcentaje Passed API')
-
-    # Placeholder para futuras integraciones con GitHub
-    date_last_check_github = fields.Datetime(string='Último check GitHub')
-    status_last_check_github = fields.Char(string='Estatus Último Check GitHub')
-    percentage_passed_github = fields.Float(string='Porcentaje Passed GitHub')
-    state = fields.Selection([
-        ('draft', 'Borrador'),
-        ('running', 'Ejecutando'),
-        ('success', 'Éxito'),
-        ('failed', 'Fallido'),
-    ], string='Estado general', default='draft', tracking=True)
-    test_result_count = fields.Integer(
-        string='Resultados de Pruebas',
-        compute='_compute_test_result_count',
-        store=False,
-    )
-    count_modules_installed = fields.Integer(
-        string='Módulos Instalados',
-        compute='_compute_count_modules_installed',
-        store=False,
-    )
-    sha_master = fields.Char(string='Último SHA del Repositorio Maestro', tracking=True)
-    fecha_sha_master = fields.Datetime(string='Fecha Último SHA', tracking=True)
-    sha_remoto = fields.Char(string='Último SHA Cliente', tracking=True)
-    actualizado = fields.Boolean(string='¿Actualizado?', compute='_compute_actualizado', store=True)
-
-    @api.depends('partner_id')
-    def _compute_count_modules_installed(self):
-        for record in self:
-            record.count_modules_installed = self.env['rs.module.status'].search_count([
-                ('partner_id', '=', record.partner_id.id),
-                ('installed', '=', True)
-            ])
-
-    @api.model
-    def cron_ejecutar_pruebas_todos_los_clientes(self):
-        clientes = self.search([])
-        for cliente in clientes:
-            try:
-                cliente.action_ejecutar_pruebas_api()
-            except Exception as e:
-                cliente.message_post(body=f"❌ Error al ejecutar pruebas automáticas: {str(e)}")
-
-    def _compute_test_result_count(self):
-        for record in self:
-            record.test_result_count = self.env['uhuu.api.test.result'].search_count([
-                ('partner_id', '=', record.partner_id.id)
-            ])
-
-    def action_ver_resultados_test(self):
-        self.ensure_one()
-        return {
-            'name': _('Resultados de Pruebas'),
-            'type': 'ir.actions.act_window',
-            'res_model': 'uhuu.api.test.result',
-            'view_mode': 'tree,form',
-            'domain': [('partner_id', '=', self.partner_id.id)],
-            'context': dict(self.env.context),
-        }
-
-    def action_ver_modulos_instalados(self):
-        self.ensure_one()
-        return {
-            'type': 'ir.actions.act_window',
-            'name': 'Módulos del Repositorio',
-            'res_model': 'rs.module.status',
-            'view_mode': 'tree,form',
-            'domain': [('partner_id', '=', self.partner_id.id)],
-            'context': {
-                'group_by': 'installed',
-            },
-            'order': 'installed desc',
-        }
-
-    def action_ejecutar_pruebas_api(self):
-        for record in self:
-            # Cambiar estado y forzar commit para que el estado se vea en UI
-            record.state = 'running'
-            record._cr.commit()
-
-            # 1. Buscar endpoint de login para el cliente actual
-            endpoint_login = self.env['uhuu.api.endpoint'].search([
-                ('partner_id', '=', record.partner_id.id),
-                ('type_login', '=', True),
-                ('active', '=', True),
-            ], limit=1)
-
-            if not endpoint_login:
-                raise UserError("No se encontró un endpoint de login para este cliente.")
-
-            # 2. Buscar entorno por defecto
-            environment = self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1)
-            if not environment:
-                raise UserError("No se encontró un entorno por defecto.")
-
-            # 3. Ejecutar login
-            token = None
-            response_login = endpoint_login._ejecutar_llamada(environment)
-
-            # Crear registro de resultado del login (exitoso o no)
-            success_login = response_login.get('success', False)
-            self.env['uhuu.api.test.result'].create({
-                'endpoint_id': endpoint_login.id,
-                'environment_id': environment.id,
-                'status_code': response_login.get('status_code'),
-                'success': success_login,
-                'response': response_login.get('response'),
-                'partner_id': record.partner_id.id,
-                'state': 'test_ok' if success_login else 'test_failed',
-            })
-
-            # 4. Validar token y terminar si falló
-            try:
-                data = json.loads(response_login.get('response', '{}'))
-                token = data.get('access_token') or data.get('token')
-                if not token:
-                    raise ValueError("No se pudo obtener token del login.")
-            except Exception as e:
-                # Si falla el login o el parseo del token, se detiene todo
-                record.state = 'failed'
-                record.status_last_check_api = 'failed'
-                record.percentage_passed_api = 0
-                record.date_last_check_api = fields.Datetime.now()
-                record.message_post(body=f"❌ Error durante login: {str(e)}")
-                return
-
-            # 5. Ejecutar pruebas para endpoints activos que no son login
-            endpoints = self.env['uhuu.api.endpoint'].search([
-                ('type_login', '=', False),
-                ('active', '=', True)
-            ])
-            total = len(endpoints)
-            passed = 0
-            failed_names = []
-
-            for ep in endpoints:
-                resultado = ep._ejecutar_llamada(environment, token=token)
-                self.env['uhuu.api.test.result'].create({
-                    'endpoint_id': ep.id,
-                    'environment_id': environment.id,
-                    'status_code': resultado.get('status_code'),
-                    'success': resultado.get('success'),
-                    'response': resultado.get('response'),
-                    'partner_id': record.partner_id.id,
-                    'state': 'test_ok' if resultado.get('success') else 'test_failed',
-                })
-
-                if resultado.get('success'):
-                    passed += 1
-                else:
-                    failed_names.append(ep.name)
-
-            # 6. Actualizar métricas y estado del test
-            record.date_last_check_api = fields.Datetime.now()
-            record.status_last_check_api = 'success' if passed == total else 'failed'
-            record.percentage_passed_api = (passed / total * 100) if total else 0
-            record.state = 'success' if passed == total else 'failed'
-
-            # 7. Reporte en el chatter
-            msg = f"🧪 Pruebas ejecutadas para el cliente **{record.partner_id.name}** usando token de login.\n\n"
-            msg += f"✅ Endpoints exitosos: {passed}/{total}\n"
-            if failed_names:
-                msg += "❌ Fallaron los siguientes endpoints:\n<ul>"
-                for name in failed_names:
-                    msg += f"<li>{name}</li>"
-                msg += "</ul>"
-            record.message_post(body=msg)
-
-    def action_consultar_shas(self):
-        self.action_consultar_sha_master()
-        self.action_consultar_sha_remoto()
-        self.date_last_check_github = fields.Datetime.now()
-
-    @api.depends('sha_master', 'sha_remoto')
-    def _compute_actualizado(self):
-        for rec in self:
-            rec.actualizado = bool(rec.sha_master and rec.sha_remoto and rec.sha_master == rec.sha_remoto)
-
-    def action_consultar_sha_master(self):
-        config = self.env['ir.config_parameter'].sudo()
-        token = config.get_param("client_consola.github_token")
-        repo = config.get_param("client_consola.github_repo")
-        branch = config.get_param("client_consola.github_branch")
-
-        if not all([token, repo, branch]):
-            raise UserError("Faltan datos en la configuración de GitHub (token, repo o rama).")
-
-        url = f"https://api.github.com/repos/{repo}/commits/{branch}"
-        headers = {'Authorization': f'token {token}'}
-
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                sha = data.get("sha")
-                for record in self:
-                    record.write({
-                        'sha_master': sha,
-                        'fecha_sha_master': fields.Datetime.now(),
-                    })
-                    record.message_post(body=f"🔄 SHA maestro actualizado: <b>{sha}</b>")
-            else:
-                raise UserError(f"Error al consultar GitHub: {response.status_code} - {response.text}")
-        except Exception as e:
-            raise UserError(f"Excepción al consultar GitHub: {str(e)}")
-
-    def _actualizar_sha_en_clientes(self, sha):
-        clientes = self.env['client.consola'].search([])
-        for cliente in clientes:
-            cliente.write({
-                'sha_master': sha,
-                'fecha_sha_master': fields.Datetime.now()
-            })
-            cliente.message_post(body=f"🔄 SHA maestro actualizado desde GitHub: <code>{sha}</code>")
-
-    def action_consultar_sha_remoto(self):
-        for rec in self:
-            if not rec.partner_id or not rec.partner_id.website:
-                raise UserError("Este cliente no tiene URL definida en el campo 'Sitio web'.")
-
-            if not rec.partner_id.github_repo_path:
-                raise UserError(
-                    "Este cliente no tiene definida la ruta del repositorio GitHub (campo github_repo_path).")
-
-            url = rec.partner_id.website.rstrip('/') + '/uhuu/github/sha'
-            token = "token-brokerlink-rs-123456"  # 🔐 tu token fijo
-
-            payload = {
-                "accion": "sha",
-                "repo_path": rec.partner_id.github_repo_path
-            }
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            _logger.info(f"🔁 Enviando solicitud SHA remoto a {url}")
-            _logger.info(f"📦 Payload: {json.dumps(payload)}")
-            _logger.info(f"🔐 Headers: {headers}")
-
-            try:
-                response = requests.post(
-                    url,
-                    headers={"Authorization": f"Bearer {token}"},
-                    json={
-                        "accion": "sha",
-                        "repo_path": rec.partner_id.github_repo_path
-                    },
-                    timeout=15
-                )
-
-                # Agrega este log aquí:
-                _logger.info(f"📨 Respuesta recibida del cliente: {response.status_code} - {response.text}")
-
-                if response.status_code == 200:
-                    data = response.json()
-                    sha = data.get("result", {}).get("sha")
-                    if not sha:
-                        raise UserError("La respuesta no contiene SHA válido.")
-
-                    rec.sha_remoto = sha
-                    rec.message_post(body=f"🔄 SHA remoto actualizado desde cliente: <code>{sha}</code>")
-                else:
-                    raise UserError(f"Error {response.status_code}: {response.text}")
-            except Exception as e:
-                raise UserError(f"No se pudo conectar con el cliente: {str(e)}")
-
-    def action_actualizar_modulos_repo(self):
-        for rec in self:
-            config = self.env['res.config.settings'].get_github_settings()
-
-            token = config['token']
-            repo = config['repo']
-            branch = config['branch']
-
-            if not token or not repo or not branch:
-                raise UserError("❌ Faltan parámetros: token, repo o branch.")
-
-            headers = {
-                "Authorization": f"token {token}",
-                "Accept": "application/vnd.github+json"
-            }
-
-            api_base = f"https://api.github.com/repos/{repo}/contents"
-            response = requests.get(f"{api_base}?ref={branch}", headers=headers)
-
-            if response.status_code != 200:
-                raise UserError(f"Error {response.status_code} al listar carpetas: {response.text}")
-
-            contenido = response.json()
-            carpetas = [item for item in contenido if item['type'] == 'dir']
-
-            ModelStatus = self.env['rs.module.status']
-            nuevos, actualizados, errores = 0, 0, 0
-
-            for carpeta in carpetas:
-                nombre_directorio = carpeta['name']
-                manifest_url = f"{api_base}/{nombre_directorio}/__manifest__.py?ref={branch}"
-
-                manifest_resp = requests.get(manifest_url, headers=headers)
-                if manifest_resp.status_code != 200:
-                    errores += 1
-                    continue  # No es un módulo válido o no tiene manifest
-
-                try:
-                    content_base64 = manifest_resp.json().get("content")
-                    content_decoded = base64.b64decode(content_base64)
-                    manifest_dict = eval(content_decoded, {"__builtins__": {}})
-
-                    version = manifest_dict.get('version', 'desconocida')
-                    summary = manifest_dict.get('summary', 'Sin resumen')
-
-                    # usamos el nombre del directorio como clave (no el 'name' del manifest)
-                    status = ModelStatus.search([
-                        ('name', '=', nombre_directorio),
-                        ('partner_id', '=', rec.partner_id.id)
-                    ], limit=1)
-
-                    if not status:
-                        ModelStatus.create({
-                            'name': nombre_directorio,
-                            'partner_id': rec.partner_id.id,
-                            'repo_version': version,
-                            'summary': summary,
-                            'last_update': fields.Datetime.now()
-                        })
-                        nuevos += 1
-                    else:
-                        status.repo_version = version
-                        status.summary = summary
-                        status.last_update = fields.Datetime.now()
-                        actualizados += 1
-
-                except Exception as e:
-                    errores += 1
-                    _logger.warning(f"⚠️ Error al procesar módulo {nombre_directorio}: {e}")
-                    continue
-
-            rec.message_post(body=_(
-                f"✅ Módulos obtenidos desde GitHub.<br/>"
-                f"📦 Nuevos: {nuevos}<br/>"
-                f"♻️ Actualizados: {actualizados}<br/>"
-                f"❌ Errores: {errores}"
-            ))
-
-    def action_verificar_estado_modulos_odoo(self):
-        IrModule = self.env['ir.module.module'].sudo()
-
-        for rec in self:
-            if not rec.partner_id:
-                raise UserError("El cliente no tiene partner_id asignado.")
-
-            modules = self.env['rs.module.status'].search([
-                ('partner_id', '=', rec.partner_id.id)
-            ])
-
-            encontrados, no_encontrados, actualizados, desactualizados = 0, 0, 0, 0
-
-            for mod in modules:
-                mod.last_chek = fields.Datetime.now()
-                ir_mod = IrModule.search([('name', '=', mod.name)], limit=1)
-
-                if ir_mod and ir_mod.state == 'installed':
-                    mod.installed = True
-                    mod.installed_version = ir_mod.installed_version or 'desconocida'
-                    encontrados += 1
-
-                    if mod.repo_version and mod.installed_version:
-                        if mod.repo_version == mod.installed_version:
-                            mod.module_updated = True
-                            actualizados += 1
-                        else:
-                            mod.module_updated = False
-                            desactualizados += 1
-                    else:
-                        mod.module_updated = False
-                else:
-                    mod.installed = False
-                    mod.installed_version = None
-                    mod.module_updated = False
-                    no_encontrados += 1
-
-            rec.message_post(body=(
-                f"🔍 Verificación completada para <b>{rec.partner_id.name}</b>:<br/>"
-                f"✔️ Instalados: {encontrados}<br/>"
-                f"🆕 No instalados: {no_encontrados}<br/>"
-                f"🔄 Actualizados: {actualizados}<br/>"
-                f"⚠️ Desactualizados: {desactualizados}"
-            ))
-
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, _
+from collections import defaultdict
+from datetime import datetime
+import hashlib
+import json
+import time
+import requests
+from odoo.exceptions import UserError
+
+from .api_end_point import CONTEXTO_LOTE, ejecutar_llamadas_concurrentes
+from ..tools import github_repo
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ClientConsola(models.Model):
+    _name = 'client.consola'
+    _description = 'Consola de Cliente - Uhuu y GitHub'
+    _inherit = ['mail.thread', 'mail.activity.mixin']
+
+    name = fields.Char(string='Nombre', tracking=True,)
+    partner_id = fields.Many2one(
+        'res.partner', string='Cliente', required=True, tracking=True,)
+
+    date_last_check_api = fields.Datetime(string='Último check API')
+    status_last_check_api = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('success', 'Test OK'),
+        ('failed', 'Test Failed'),
+    ], string='Estatus Último Check APIs')
+    percentage_passed_api = fields.Float(string='Porcentaje Passed API')
+
+    # Placeholder para futuras integraciones con GitHub
+    date_last_check_github = fields.Datetime(string='Último check GitHub')
+    status_last_check_github = fields.Char(string='Estatus Último Check GitHub')
+    percentage_passed_github = fields.Float(string='Porcentaje Passed GitHub')
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('running', 'Ejecutando'),
+        ('success', 'Éxito'),
+        ('failed', 'Fallido'),
+    ], string='Estado general', default='draft', tracking=True)
+    test_result_count = fields.Integer(
+        string='Resultados de Pruebas',
+        compute='_compute_test_result_count',
+        store=False,
+    )
+    count_modules_installed = fields.Integer(
+        string='Módulos Instalados',
+        compute='_compute_count_modules_installed',
+        store=False,
+    )
+    sha_master = fields.Char(string='Último SHA del Repositorio Maestro', tracking=True)
+    fecha_sha_master = fields.Datetime(string='Fecha Último SHA', tracking=True)
+    sha_remoto = fields.Char(string='Último SHA Cliente', tracking=True)
+    fecha_sha_remoto = fields.Datetime(string='Último sondeo SHA cliente', readonly=True)
+    sha_remoto_ok = fields.Boolean(string='Sondeo SHA correcto', readonly=True)
+    sha_remoto_error = fields.Char(string='Error del sondeo SHA', readonly=True)
+    sha_remoto_duration = fields.Float(string='Latencia sondeo SHA (s)', digits=(16, 3), readonly=True)
+    actualizado = fields.Boolean(string='¿Actualizado?', compute='_compute_actualizado', store=True)
+    api_test_interval = fields.Integer(
+        string='Intervalo de pruebas (min)', default=5,
+        help="Cada cuántos minutos el cron encola las pruebas API de este cliente.")
+    next_api_test_at = fields.Datetime(string='Próximas pruebas API', copy=False)
+    run_job_ids = fields.One2many('uhuu.api.run.job', 'client_id', string='Ejecuciones en cola')
+    last_full_api_run_at = fields.Datetime(string='Último barrido completo', readonly=True, copy=False)
+    tested_sha_remoto = fields.Char(string='SHA probado', readonly=True, copy=False,
+                                    help="SHA remoto del cliente en la última ejecución de pruebas")
+    tested_modules_hash = fields.Char(string='Firma de módulos probada', readonly=True, copy=False)
+
+    @api.depends('partner_id')
+    def _compute_count_modules_installed(self):
+        # Un único conteo agrupado por partner para todo el recordset
+        conteos = dict(self.env['rs.module.status']._read_group(
+            [('partner_id', 'in', self.partner_id.ids), ('installed', '=', True)],
+            groupby=['partner_id'], aggregates=['__count'],
+        ))
+        for record in self:
+            record.count_modules_installed = conteos.get(record.partner_id, 0)
+
+    @api.model
+    def cron_ejecutar_pruebas_todos_los_clientes(self):
+        # Solo encola: los workers de uhuu.api.run.job ejecutan cada cliente de forma independiente
+        ahora = fields.Datetime.now()
+        clientes = self.search(['|', ('next_api_test_at', '=', False), ('next_api_test_at', '<=', ahora)])
+        self.env['uhuu.api.run.job']._encolar(clientes)
+        for intervalo, grupo in clientes.grouped('api_test_interval').items():
+            grupo.write({'next_api_test_at': fields.Datetime.add(ahora, minutes=intervalo or 5)})
+
+    def _compute_test_result_count(self):
+        conteos = dict(self.env['uhuu.api.test.result']._read_group(
+            [('partner_id', 'in', self.partner_id.ids)],
+            groupby=['partner_id'], aggregates=['__count'],
+        ))
+        for record in self:
+            record.test_result_count = conteos.get(record.partner_id, 0)
+
+    def action_ver_resultados_test(self):
+        self.ensure_one()
+        return {
+            'name': _('Resultados de Pruebas'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'uhuu.api.test.result',
+            'view_mode': 'tree,form',
+            'domain': [('partner_id', '=', self.partner_id.id)],
+            'context': dict(self.env.context),
+        }
+
+    def action_ver_latencia(self):
+        self.ensure_one()
+        return self.env['uhuu.api.test.result']._accion_tendencia_latencia(
+            [('partner_id', '=', self.partner_id.id)], _('Latencia: %s') % self.partner_id.display_name)
+
+    def action_ver_modulos_instalados(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Módulos del Repositorio',
+            'res_model': 'rs.module.status',
+            'view_mode': 'tree,form',
+            'domain': [('partner_id', '=', self.partner_id.id)],
+            'context': {
+                'group_by': 'installed',
+            },
+            'order': 'installed desc',
+        }
+
+    def _get_max_workers_api(self):
+        return self.env['res.config.settings'].get_api_settings()['max_workers']
+
+    def _get_http_session(self, url):
+        # Sesión keep-alive compartida por host (GitHub o instancia del cliente)
+        return self.env['res.config.settings']._get_http_session(url)
+
+    def action_ejecutar_pruebas_api(self, max_workers=None):
+        # Límite de concurrencia por ejecución: argumento, contexto o configuración general
+        max_workers = max_workers or self.env.context.get('max_workers') or self._get_max_workers_api()
+        etiquetas = dict(self._fields['state']._description_selection(self.env))
+        for record in self.with_context(**CONTEXTO_LOTE):
+            # Durante la ejecución no hay tracking: al final se deja un único resumen en el chatter
+            estado_anterior = record.state
+
+            # Cambiar estado y forzar commit para que el estado se vea en UI
+            record.state = 'running'
+            record._cr.commit()
+
+            # 1. Buscar endpoint de login para el cliente actual
+            endpoint_login = self.env['uhuu.api.endpoint'].search([
+                ('partner_id', '=', record.partner_id.id),
+                ('type_login', '=', True),
+                ('active', '=', True),
+            ], limit=1)
+
+            if not endpoint_login:
+                raise UserError("No se encontró un endpoint de login para este cliente.")
+
+            # 2. Buscar entorno por defecto
+            environment = self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1)
+            if not environment:
+                raise UserError("No se encontró un entorno por defecto.")
+
+            # 3. Obtener token del login (desde caché mientras siga vigente)
+            token, response_login = endpoint_login._obtener_token(environment)
+
+            # Los resultados se acumulan y se insertan en lote al final de la ejecución
+            TestResult = self.env['uhuu.api.test.result']
+            resultados_pendientes = []
+
+            # Registrar resultado del login (exitoso o no) solo si hubo llamada
+            if response_login is not None:
+                resultados_pendientes.append(
+                    TestResult._preparar_vals(endpoint_login, environment, record.partner_id, response_login))
+
+            # 4. Validar token y terminar si falló
+            if not token:
+                # Si falla el login o el parseo del token, se detiene todo
+                record.state = 'failed'
+                record.status_last_check_api = 'failed'
+                record.percentage_passed_api = 0
+                record.date_last_check_api = fields.Datetime.now()
+                TestResult._registrar_resultados(resultados_pendientes)
+                msg = f"❌ Error durante login: {response_login.get('token_error')}"
+                if estado_anterior != 'failed':
+                    msg += f"<br/>🔁 Estado: {etiquetas.get(estado_anterior, estado_anterior)} → {etiquetas['failed']}"
+                record.message_post(body=msg)
+                return
+
+            # 5. Ejecutar pruebas para endpoints activos que no son login
+            endpoints = self.env['uhuu.api.endpoint'].search([
+                ('type_login', '=', False),
+                ('active', '=', True)
+            ])
+            total = len(endpoints)
+            passed = 0
+            failed_names = []
+
+            # En modo incremental solo se ejecuta lo que pudo cambiar; lo omitido estaba OK
+            motivos, modulos_hash, completo = record._seleccionar_endpoints(endpoints, environment)
+            ejecutar = endpoints.filtered(lambda ep: motivos[ep.id] != 'unchanged')
+            omitidos = total - len(ejecutar)
+            passed += omitidos
+
+            # Las llamadas HTTP se lanzan en paralelo; el registro vuelve al hilo del ORM
+            peticiones = [ep._preparar_llamada(environment, token=token) for ep in ejecutar]
+            resultados = ejecutar_llamadas_concurrentes(
+                peticiones, max_workers=max_workers, deadline=self.env.context.get('deadline'))
+
+            for ep, resultado in zip(ejecutar, resultados):
+                resultados_pendientes.append(TestResult._preparar_vals(ep, environment, record.partner_id, resultado))
+
+                if resultado.get('success'):
+                    passed += 1
+                else:
+                    failed_names.append(ep.name)
+
+            TestResult._registrar_resultados(resultados_pendientes)
+            record._registrar_seleccion(endpoints, motivos, dict(zip(ejecutar.ids, resultados)))
+            record.write({
+                'tested_sha_remoto': record.sha_remoto,
+                'tested_modules_hash': modulos_hash,
+                'last_full_api_run_at': fields.Datetime.now() if completo else record.last_full_api_run_at,
+            })
+
+            if any(resultado.get('status_code') == 401 for resultado in resultados):
+                # Token rechazado por la API: la próxima ejecución vuelve a hacer login
+                endpoint_login._invalidar_tokens(environment)
+
+            # 6. Actualizar métricas y estado del test
+            record.date_last_check_api = fields.Datetime.now()
+            record.status_last_check_api = 'success' if passed == total else 'failed'
+            record.percentage_passed_api = (passed / total * 100) if total else 0
+            record.state = 'success' if passed == total else 'failed'
+
+            # 7. Reporte en el chatter
+            msg = f"🧪 Pruebas ejecutadas para el cliente **{record.partner_id.name}** usando token de login.\n\n"
+            msg += f"✅ Endpoints exitosos: {passed}/{total}\n"
+            if omitidos:
+                msg += f"⏭️ Omitidos sin cambios desde su último éxito: {omitidos}\n"
+            if failed_names:
+                msg += "❌ Fallaron los siguientes endpoints:\n<ul>"
+                for name in failed_names:
+                    msg += f"<li>{name}</li>"
+                msg += "</ul>"
+            if estado_anterior != record.state:
+                msg += f"🔁 Estado: {etiquetas.get(estado_anterior, estado_anterior)} → {etiquetas[record.state]}\n"
+            record.message_post(body=msg)
+
+    def _firma_modulos(self):
+        self.ensure_one()
+        estados = self.env['rs.module.status'].search_read(
+            [('partner_id', '=', self.partner_id.id), ('installed', '=', True)],
+            ['name', 'installed_version'], order='name')
+        return hashlib.sha1(json.dumps(
+            [(e['name'], e['installed_version']) for e in estados]).encode()).hexdigest()
+
+    def _seleccionar_endpoints(self, endpoints, environment):
+        """Devuelve ``({endpoint_id: motivo}, firma_modulos, es_barrido_completo)``.
+
+        Con ``api_test_mode='incremental'`` en el contexto solo se eligen endpoints nuevos,
+        modificados o que fallaron la última vez, salvo que el cliente haya cambiado
+        (SHA remoto o módulos) o toque el barrido completo periódico.
+        """
+        self.ensure_one()
+        modulos_hash = self._firma_modulos()
+        modo = self.env.context.get('api_test_mode', 'full')
+        horas = self.env['res.config.settings'].get_api_settings()['full_sweep_hours']
+        limite_barrido = fields.Datetime.subtract(fields.Datetime.now(), hours=horas)
+
+        if modo == 'full' or not self.last_full_api_run_at or self.last_full_api_run_at <= limite_barrido:
+            return {ep.id: 'full' for ep in endpoints}, modulos_hash, True
+        if self.tested_sha_remoto != self.sha_remoto or self.tested_modules_hash != modulos_hash:
+            return {ep.id: 'client_changed' for ep in endpoints}, modulos_hash, False
+
+        # Último resultado de cada endpoint para este cliente y entorno, en una sola consulta
+        ultimos = {}
+        if endpoints:
+            self.env['uhuu.api.test.result'].flush_model()
+            self.env.cr.execute("""
+                SELECT DISTINCT ON (endpoint_id) endpoint_id, success, tested_at
+                  FROM uhuu_api_test_result
+                 WHERE partner_id = %s AND environment_id = %s AND endpoint_id IN %s
+                 ORDER BY endpoint_id, tested_at DESC, id DESC
+            """, (self.partner_id.id, environment.id, tuple(endpoints.ids)))
+            ultimos = {endpoint_id: (success, tested_at) for endpoint_id, success, tested_at in self.env.cr.fetchall()}
+
+        motivos = {}
+        for ep in endpoints:
+            success, tested_at = ultimos.get(ep.id, (None, None))
+            if tested_at is None:
+                motivos[ep.id] = 'new'
+            elif not success:
+                motivos[ep.id] = 'failed'
+            elif ep.plan_changed_at and ep.plan_changed_at > tested_at:
+                motivos[ep.id] = 'definition'
+            else:
+                motivos[ep.id] = 'unchanged'
+        return motivos, modulos_hash, False
+
+    def _registrar_seleccion(self, endpoints, motivos, resultados):
+        # Solo las ejecuciones de la cola guardan el detalle: una línea por endpoint ejecutado
+        # y los omitidos agrupados por motivo en un único JSON {motivo: [endpoint_ids]}
+        job_id = self.env.context.get('run_job_id')
+        if not job_id:
+            return
+        omitidos = defaultdict(list)
+        for ep in endpoints:
+            if ep.id not in resultados:
+                omitidos[motivos[ep.id]].append(ep.id)
+        self.env['uhuu.api.run.job.line'].create([{
+            'job_id': job_id,
+            'endpoint_id': ep.id,
+            'reason': motivos[ep.id],
+            'success': resultados[ep.id].get('success'),
+        } for ep in endpoints if ep.id in resultados])
+        self.env['uhuu.api.run.job'].browse(job_id).write({
+            'endpoint_run_count': len(resultados),
+            'endpoint_skipped_count': sum(len(ids) for ids in omitidos.values()),
+            'skipped_endpoints': json.dumps(omitidos) if omitidos else False,
+        })
+
+    def action_consultar_shas(self):
+        self.action_consultar_sha_master()
+        self.action_consultar_sha_remoto()
+        self.date_last_check_github = fields.Datetime.now()
+
+    @api.depends('sha_master', 'sha_remoto')
+    def _compute_actualizado(self):
+        for rec in self:
+            rec.actualizado = bool(rec.sha_master and rec.sha_remoto and rec.sha_master == rec.sha_remoto)
+
+    def action_consultar_sha_master(self):
+        # El SHA maestro es el mismo para todos: se consulta una vez y se reparte a todos los clientes
+        self._actualizar_sha_en_clientes()
+
+    @api.model
+    def _consultar_sha_master_global(self):
+        config = self.env['res.config.settings'].get_github_settings()
+        token = config['token']
+        repo = config['repo']
+        branch = config['branch']
+
+        if not all([token, repo, branch]):
+            raise UserError("Faltan datos en la configuración de GitHub (token, repo o rama).")
+
+        headers = {'Authorization': f'token {token}'}
+        try:
+            sha = github_repo.obtener_sha_rama(
+                self._get_http_session(github_repo.API_URL), repo, branch, headers, ttl=config['sha_ttl'])
+        except Exception as e:
+            raise UserError(f"Excepción al consultar GitHub: {str(e)}")
+        if not sha:
+            raise UserError("La respuesta de GitHub no contiene SHA.")
+        return sha
+
+    @api.model
+    def _actualizar_sha_en_clientes(self, sha=None):
+        sha = sha or self._consultar_sha_master_global()
+        # Una sola escritura para todos los clientes con SHA distinto; solo a ellos se les deja mensaje
+        cambiados = self.env['client.consola'].search([
+            '|', ('sha_master', '=', False), ('sha_master', '!=', sha),
+        ])
+        if cambiados:
+            cambiados = cambiados.with_context(**CONTEXTO_LOTE)
+            cambiados.write({
+                'sha_master': sha,
+                'fecha_sha_master': fields.Datetime.now()
+            })
+            for cliente in cambiados:
+                cliente.message_post(body=f"🔄 SHA maestro actualizado desde GitHub: <code>{sha}</code>")
+        return sha
+
+    @api.model
+    def cron_actualizar_sha_master(self):
+        self._actualizar_sha_en_clientes()
+
+    def action_consultar_sha_remoto(self):
+        # El fallo de un cliente queda registrado en sha_remoto_error sin interrumpir al resto
+        self._sondear_sha_remoto()
+
+    @api.model
+    def cron_consultar_sha_remoto_todos(self):
+        self.search([])._sondear_sha_remoto()
+
+    def _peticion_sha_remoto(self):
+        self.ensure_one()
+        if not self.partner_id or not self.partner_id.website:
+            return "Este cliente no tiene URL definida en el campo 'Sitio web'."
+        if not self.partner_id.github_repo_path:
+            return "Este cliente no tiene definida la ruta del repositorio GitHub (campo github_repo_path)."
+
+        url = self.partner_id.website.rstrip('/') + '/uhuu/github/sha'
+        token = "token-brokerlink-rs-123456"  # 🔐 tu token fijo
+        return {
+            'method': 'POST',
+            'url': url,
+            'headers': {"Authorization": f"Bearer {token}"},
+            'json': {
+                "accion": "sha",
+                "repo_path": self.partner_id.github_repo_path
+            },
+            'session': self._get_http_session(url),
+        }
+
+    def _sondear_sha_remoto(self):
+        """Consulta en paralelo el SHA de cada instancia; un cliente caído no afecta a los demás."""
+        config = self.env['res.config.settings'].get_github_settings()
+        inicio = time.time()
+        deadline = inicio + config['remote_deadline']
+
+        # Preparación en el hilo principal (ORM); solo el envío va al pool de hilos
+        resultados, peticiones = {}, []
+        for rec in self:
+            peticion = rec._peticion_sha_remoto()
+            if isinstance(peticion, str):
+                resultados[rec.id] = {'success': False, 'error': peticion, 'duration': 0.0}
+            else:
+                peticiones.append((rec, peticion))
+
+        _logger.info(f"🔁 Consultando SHA remoto de {len(peticiones)} clientes")
+        respuestas = ejecutar_llamadas_concurrentes(
+            [peticion for rec, peticion in peticiones],
+            max_workers=config['remote_workers'],
+            deadline=deadline,
+        )
+        for (rec, peticion), respuesta in zip(peticiones, respuestas):
+            resultado = {'success': False, 'error': False, 'duration': respuesta.get('duration') or 0.0}
+            if respuesta['status_code'] == 200:
+                try:
+                    resultado['sha'] = json.loads(respuesta['response']).get("result", {}).get("sha")
+                except (ValueError, AttributeError):
+                    resultado['sha'] = None
+                if resultado['sha']:
+                    resultado['success'] = True
+                else:
+                    resultado['error'] = "La respuesta no contiene SHA válido."
+            elif respuesta['status_code']:
+                resultado['error'] = f"Error {respuesta['status_code']}: {respuesta['response'][:500]}"
+            else:
+                resultado['error'] = respuesta['response'][:500]
+            resultados[rec.id] = resultado
+
+        self._guardar_sha_remoto(resultados)
+        fallidos = sum(1 for r in resultados.values() if not r['success'])
+        _logger.info(
+            f"✅ SHA remoto consultado en {time.time() - inicio:.1f}s: "
+            f"{len(resultados) - fallidos} correctos, {fallidos} con error")
+        return resultados
+
+    def _guardar_sha_remoto(self, resultados):
+        ahora = fields.Datetime.now()
+        # Campos con tracking/compute por ORM solo donde el SHA cambió, agrupados por SHA; el resto en un único UPDATE
+        cambiados = self.browse()
+        por_sha = defaultdict(list)
+        for rec in self:
+            resultado = resultados[rec.id]
+            if resultado['success'] and rec.sha_remoto != resultado['sha']:
+                por_sha[resultado['sha']].append(rec.id)
+                cambiados |= rec
+        for sha, ids in por_sha.items():
+            self.browse(ids).with_context(**CONTEXTO_LOTE).write({'sha_remoto': sha})
+
+        self.flush_model(['sha_remoto'])
+        self.env.cr.execute("""
+            UPDATE client_consola c
+               SET fecha_sha_remoto = %s,
+                   sha_remoto_ok = v.ok,
+                   sha_remoto_error = v.error,
+                   sha_remoto_duration = v.duration
+              FROM unnest(%s::int[], %s::bool[], %s::varchar[], %s::float8[]) AS v(id, ok, error, duration)
+             WHERE c.id = v.id
+        """, (
+            ahora,
+            list(resultados),
+            [r['success'] for r in resultados.values()],
+            [r['error'] or None for r in resultados.values()],
+            [r['duration'] for r in resultados.values()],
+        ))
+        self.invalidate_recordset(['fecha_sha_remoto', 'sha_remoto_ok', 'sha_remoto_error', 'sha_remoto_duration'])
+
+        for rec in cambiados:
+            rec.message_post(body=f"🔄 SHA remoto actualizado desde cliente: <code>{rec.sha_remoto}</code>")
+
+    def action_actualizar_modulos_repo(self):
+        config = self.env['res.config.settings'].get_github_settings()
+
+        token = config['token']
+        repo = config['repo']
+        branch = config['branch']
+
+        if not token or not repo or not branch:
+            raise UserError("❌ Faltan parámetros: token, repo o branch.")
+
+        headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json"
+        }
+        session = self._get_http_session(github_repo.API_URL)
+
+        # Un solo árbol para todos los clientes; si no cambió, GitHub responde 304
+        try:
+            blobs = github_repo.listar_manifiestos(session, repo, branch, headers)
+        except (github_repo.GithubError, requests.exceptions.RequestException) as e:
+            raise UserError(str(e))
+
+        ModelStatus = self.env['rs.module.status']
+        estados = ModelStatus.search([
+            ('partner_id', 'in', self.partner_id.ids),
+            ('name', 'in', list(blobs)),
+        ])
+        por_partner = {(s.partner_id.id, s.name): s for s in estados}
+
+        # Solo se leen los manifiestos cuyo blob cambió para algún cliente
+        pendientes = {
+            modulo: sha for modulo, sha in blobs.items()
+            if any(por_partner.get((rec.partner_id.id, modulo), ModelStatus).manifest_sha != sha for rec in self)
+        }
+        try:
+            manifiestos = github_repo.leer_manifiestos(session, repo, branch, headers, pendientes) if pendientes else {}
+        except (github_repo.GithubError, requests.exceptions.RequestException) as e:
+            raise UserError(f"Error al leer los manifiestos del repositorio: {e}")
+
+        for rec in self:
+            nuevos, actualizados, sin_cambios, errores = 0, 0, 0, 0
+            crear = []
+
+            for nombre_directorio, sha in blobs.items():
+                # usamos el nombre del directorio como clave (no el 'name' del manifest)
+                status = por_partner.get((rec.partner_id.id, nombre_directorio))
+                if status and status.manifest_sha == sha:
+                    sin_cambios += 1
+                    continue
+
+                manifest_dict = manifiestos.get(nombre_directorio)
+                if not isinstance(manifest_dict, dict):
+                    errores += 1
+                    _logger.warning(f"⚠️ Error al procesar módulo {nombre_directorio}: {manifest_dict}")
+                    continue
+
+                vals = {
+                    'repo_version': manifest_dict.get('version', 'desconocida'),
+                    'summary': manifest_dict.get('summary', 'Sin resumen'),
+                    'manifest_sha': sha,
+                    'last_update': fields.Datetime.now(),
+                }
+                if not status:
+                    crear.append(dict(vals, name=nombre_directorio, partner_id=rec.partner_id.id))
+                    nuevos += 1
+                else:
+                    status.write(vals)
+                    actualizados += 1
+
+            ModelStatus.create(crear)
+            rec.message_post(body=_(
+                f"✅ Módulos obtenidos desde GitHub.<br/>"
+                f"📦 Nuevos: {nuevos}<br/>"
+                f"♻️ Actualizados: {actualizados}<br/>"
+                f"⏭️ Sin cambios: {sin_cambios}<br/>"
+                f"❌ Errores: {errores}"
+            ))
+
+    def action_verificar_estado_modulos_odoo(self):
+        if any(not rec.partner_id for rec in self):
+            raise UserError("El cliente no tiene partner_id asignado.")
+
+        # Todos los estados de los clientes seleccionados y una sola consulta a ir.module.module
+        statuses = self.env['rs.module.status'].search([
+            ('partner_id', 'in', self.partner_id.ids)
+        ])
+        ir_modules = self.env['ir.module.module'].sudo().search([
+            ('name', 'in', list(set(statuses.mapped('name'))))
+        ])
+        instalados = {
+            m.name: m.installed_version or 'desconocida'
+            for m in ir_modules if m.state == 'installed'
+        }
+
+        ahora = fields.Datetime.now()
+        grupos = defaultdict(list)  # vals a escribir -> ids de rs.module.status
+        conteos = defaultdict(lambda: [0, 0, 0, 0])  # partner -> encontrados, no encontrados, actualizados, desactualizados
+        for mod in statuses:
+            conteo = conteos[mod.partner_id.id]
+            version = instalados.get(mod.name)
+            if version:
+                conteo[0] += 1
+                actualizado = bool(mod.repo_version) and mod.repo_version == version
+                if mod.repo_version:
+                    conteo[2 if actualizado else 3] += 1
+                grupos[(True, version, actualizado)].append(mod.id)
+            else:
+                conteo[1] += 1
+                grupos[(False, None, False)].append(mod.id)
+
+        Status = self.env['rs.module.status']
+        for (installed, version, actualizado), ids in grupos.items():
+            Status.browse(ids).write({
+                'installed': installed,
+                'installed_version': version,
+                'module_updated': actualizado,
+                'last_chek': ahora,
+            })
+
+        for rec in self:
+            encontrados, no_encontrados, actualizados, desactualizados = conteos[rec.partner_id.id]
+            rec.message_post(body=(
+                f"🔍 Verificación completada para <b>{rec.partner_id.name}</b>:<br/>"
+                f"✔️ Instalados: {encontrados}<br/>"
+                f"🆕 No instalados: {no_encontrados}<br/>"
+                f"🔄 Actualizados: {actualizados}<br/>"
+                f"⚠️ Desactualizados: {desactualizados}"
+            ))
+
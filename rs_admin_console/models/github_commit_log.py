@@ -1,9 +1,122 @@
-from odoo import models, fields
-
-class UhuuGithubCommitLog(models.Model):
-    _name = 'uhuu.github.commit.log'
-    _description = 'Historial de commits GitHub que dispararon pruebas'
-
-    commit_id = fields.Char()
-    message = fields.Text()
-    triggered_at = fields.Datetime(default=fields.Datetime.now)
+from odoo import models, fields, api
+import logging
+
+from ..tools import github_repo
+
+_logger = logging.getLogger(__name__)
+
+# GitHub solo incluye los primeros 20 commits de un push en el payload
+MAX_COMMITS_PAYLOAD = 20
+
+
+class UhuuGithubCommitLog(models.Model):
+    _name = 'uhuu.github.commit.log'
+    _description = 'Historial de commits GitHub que dispararon pruebas'
+    _order = 'triggered_at desc, id desc'
+
+    commit_id = fields.Char(string='Commit', index=True)
+    message = fields.Text(string='Mensaje')
+    triggered_at = fields.Datetime(string='Recibido', default=fields.Datetime.now)
+    delivery_id = fields.Char(string='Entrega GitHub', readonly=True, copy=False)
+    repo = fields.Char(string='Repositorio', readonly=True)
+    branch = fields.Char(string='Rama', readonly=True)
+    before_sha = fields.Char(string='SHA anterior', readonly=True)
+    pusher = fields.Char(string='Autor del push', readonly=True)
+    modules_changed = fields.Text(string='Módulos modificados', readonly=True)
+    manifests_changed = fields.Boolean(string='Cambió algún manifiesto', readonly=True)
+    state = fields.Selection([
+        ('processed', 'Procesado'),
+        ('ignored', 'Ignorado'),
+    ], string='Estado', readonly=True, default='processed')
+    client_count = fields.Integer(string='Clientes con SHA actualizado', readonly=True)
+    job_count = fields.Integer(string='Trabajos encolados', readonly=True)
+
+    _sql_constraints = [
+        ('delivery_id_unique', 'unique(delivery_id)', 'La entrega de GitHub ya fue registrada.'),
+    ]
+
+    @api.model
+    def _modulos_del_push(self, payload):
+        """Devuelve ``(modulos, manifiestos_cambiados)``; ``modulos`` es None si el payload no
+        permite saber qué cambió (push truncado o forzado) y hay que tratarlo como cambio total."""
+        commits = payload.get('commits') or []
+        if payload.get('forced') or len(commits) >= MAX_COMMITS_PAYLOAD:
+            return None, True
+        modulos, manifiestos = set(), False
+        for commit in commits:
+            for ruta in commit.get('added', []) + commit.get('modified', []) + commit.get('removed', []):
+                partes = ruta.split('/')
+                if len(partes) < 2:
+                    continue
+                modulos.add(partes[0])
+                if len(partes) == 2 and partes[1] == github_repo.MANIFEST:
+                    manifiestos = True
+        return modulos, manifiestos
+
+    @api.model
+    def _registrar_push(self, payload, delivery_id=None):
+        if delivery_id:
+            existente = self.search([('delivery_id', '=', delivery_id)], limit=1)
+            if existente:
+                return existente
+
+        config = self.env['res.config.settings'].get_github_settings()
+        repo = (payload.get('repository') or {}).get('full_name')
+        ref = payload.get('ref') or ''
+        branch = ref.removeprefix('refs/heads/')
+        sha = payload.get('after')
+        head = payload.get('head_commit') or {}
+        vals = {
+            'delivery_id': delivery_id,
+            'commit_id': sha,
+            'message': head.get('message'),
+            'repo': repo,
+            'branch': branch,
+            'before_sha': payload.get('before'),
+            'pusher': (payload.get('pusher') or {}).get('name'),
+        }
+
+        es_rama_maestra = (
+            repo and config['repo'] and repo.lower() == config['repo'].lower()
+            and ref.startswith('refs/heads/') and branch == config['branch']
+        )
+        if not es_rama_maestra or payload.get('deleted') or not sha or not sha.strip('0'):
+            _logger.info("⏭️ Push ignorado de %s (%s)", repo, ref)
+            return self.create(dict(vals, state='ignored'))
+
+        modulos, manifiestos = self._modulos_del_push(payload)
+        Client = self.env['client.consola']
+        Job = self.env['uhuu.api.run.job']
+
+        # El SHA llega en el payload: se reparte sin consultar GitHub y se descarta la caché
+        github_repo.invalidar_sha(config['repo'], config['branch'])
+        clientes_sha = Client.search(['|', ('sha_master', '=', False), ('sha_master', '!=', sha)])
+        Client._actualizar_sha_en_clientes(sha)
+
+        # Solo se reescanea el repo si cambió algún manifiesto, y solo se prueban los clientes
+        # que tienen instalado alguno de los módulos tocados
+        jobs = Job.browse()
+        if manifiestos:
+            jobs |= Job._encolar(Client.search([]), job_type='module_scan')
+        if modulos is None:
+            clientes_api = Client.search([])
+        elif modulos:
+            partners = self.env['rs.module.status'].search([
+                ('name', 'in', list(modulos)),
+                ('installed', '=', True),
+            ]).partner_id
+            clientes_api = Client.search([('partner_id', 'in', partners.ids)])
+        else:
+            clientes_api = Client.browse()
+        jobs |= Job._encolar(clientes_api, mode='full')
+
+        _logger.info(
+            "📬 Push %s en %s@%s: %s clientes actualizados, %s trabajos encolados",
+            sha[:7], repo, branch, len(clientes_sha), len(jobs))
+        return self.create(dict(
+            vals,
+            modules_changed=', '.join(sorted(modulos)) if modulos is not None else 'Todos',
+            manifests_changed=manifiestos,
+            client_count=len(clientes_sha),
+            job_count=len(jobs),
+        ))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+from collections import defaultdict
+import json
+import logging
+import random
+import time
+
+import psycopg2
+from psycopg2 import errorcodes
+
+from ..tools import histogram
+
+_logger = logging.getLogger(__name__)
+
+# La violación de FK aparece si se borra un endpoint o entorno mientras tanto: al reintentar se descarta
+ERRORES_CONCURRENCIA = (
+    errorcodes.SERIALIZATION_FAILURE, errorcodes.DEADLOCK_DETECTED, errorcodes.UNIQUE_VIOLATION,
+    errorcodes.FOREIGN_KEY_VIOLATION)
+
+
+class UhuuApiLatencySummary(models.Model):
+    _name = 'uhuu.api.latency.summary'
+    _description = 'Resumen de latencia por endpoint y entorno'
+    _order = 'endpoint_id, environment_id'
+
+    endpoint_id = fields.Many2one('uhuu.api.endpoint', required=True, readonly=True, ondelete='cascade', index=True)
+    environment_id = fields.Many2one('uhuu.api.environment', required=True, readonly=True, ondelete='cascade')
+    sample_count = fields.Integer(string='Muestras', readonly=True)
+    weight = fields.Float(string='Peso reciente', readonly=True,
+                          help="Número efectivo de muestras tras aplicar el decaimiento.")
+    duration_sum = fields.Float(string='Suma ponderada (s)', readonly=True)
+    latency_mean = fields.Float(string='Media (s)', readonly=True, digits=(16, 3))
+    latency_min = fields.Float(string='Mín (s)', readonly=True, digits=(16, 3))
+    latency_max = fields.Float(string='Máx (s)', readonly=True, digits=(16, 3))
+    latency_p50 = fields.Float(string='p50 (s)', readonly=True, digits=(16, 3))
+    latency_p95 = fields.Float(string='p95 (s)', readonly=True, digits=(16, 3))
+    latency_p99 = fields.Float(string='p99 (s)', readonly=True, digits=(16, 3))
+    last_duration = fields.Float(string='Última (s)', readonly=True, digits=(16, 3))
+    last_sample_at = fields.Datetime(string='Última muestra', readonly=True)
+    histogram = fields.Text(string='Histograma', readonly=True)
+
+    _sql_constraints = [
+        ('endpoint_environment_uniq', 'unique(endpoint_id, environment_id)',
+         'Solo puede haber un resumen de latencia por endpoint y entorno.'),
+    ]
+
+    @api.model
+    def _registrar_duraciones(self, muestras):
+        """Incorpora ``[(endpoint_id, environment_id, segundos), ...]`` a los resúmenes.
+
+        Se aplica en una transacción corta e independiente para que los workers que prueban
+        los mismos endpoints en paralelo no se bloqueen hasta el final de sus ejecuciones;
+        ante un conflicto de concurrencia se reintenta. Los endpoints o entornos creados en la
+        transacción en curso (aún no visibles para otra conexión) se resumen en esta misma transacción.
+        Se escribe como superusuario: los usuarios internos solo leen los resúmenes.
+        """
+        por_clave = defaultdict(list)
+        for endpoint_id, environment_id, duracion in muestras:
+            if endpoint_id and environment_id and duracion is not None:
+                por_clave[(endpoint_id, environment_id)].append(duracion)
+        if not por_clave:
+            return
+        resumen = self.sudo()
+        for intento in range(3):
+            try:
+                with self.env.registry.cursor() as cr:
+                    pendientes = resumen.with_env(resumen.env(cr=cr))._aplicar_duraciones(por_clave)
+                if pendientes:
+                    resumen._aplicar_duraciones(pendientes, solo_visibles=False)
+                return
+            except psycopg2.Error as e:
+                if e.pgcode not in ERRORES_CONCURRENCIA:
+                    raise
+                time.sleep(random.uniform(0.05, 0.3) * (intento + 1))
+        _logger.warning("⚠️ No se pudo actualizar el resumen de latencias por concurrencia; se omiten %s muestras",
+                        sum(len(v) for v in por_clave.values()))
+
+    def _aplicar_duraciones(self, por_clave, solo_visibles=True):
+        """Aplica las duraciones y devuelve las que no pudo aplicar por no ver su endpoint o entorno."""
+        pendientes = {}
+        if solo_visibles:
+            self.env.cr.execute("SELECT id FROM uhuu_api_endpoint WHERE id IN %s",
+                                (tuple({k[0] for k in por_clave}),))
+            endpoints = {row[0] for row in self.env.cr.fetchall()}
+            self.env.cr.execute("SELECT id FROM uhuu_api_environment WHERE id IN %s",
+                                (tuple({k[1] for k in por_clave}),))
+            entornos = {row[0] for row in self.env.cr.fetchall()}
+            pendientes = {k: v for k, v in por_clave.items() if k[0] not in endpoints or k[1] not in entornos}
+            por_clave = {k: v for k, v in por_clave.items() if k not in pendientes}
+            if not por_clave:
+                return pendientes
+        decay = self.env['res.config.settings'].get_api_settings()['latency_decay']
+        endpoint_ids = list({k[0] for k in por_clave})
+        # Bloqueo en orden de id para evitar interbloqueos entre workers
+        self.env.cr.execute("""
+            SELECT id FROM uhuu_api_latency_summary
+             WHERE endpoint_id IN %s ORDER BY id FOR UPDATE
+        """, (tuple(endpoint_ids),))
+        existentes = {
+            (s.endpoint_id.id, s.environment_id.id): s
+            for s in self.browse([row[0] for row in self.env.cr.fetchall()])
+        }
+        ahora = fields.Datetime.now()
+        nuevos = []
+        for (endpoint_id, environment_id), duraciones in por_clave.items():
+            resumen = existentes.get((endpoint_id, environment_id))
+            conteos = histogram.agregar(
+                json.loads(resumen.histogram) if resumen and resumen.histogram else None, duraciones, decay)
+            factor = decay ** len(duraciones)
+            weight = (resumen.weight if resumen else 0.0) * factor + len(duraciones)
+            duration_sum = (resumen.duration_sum if resumen else 0.0) * factor + sum(duraciones)
+            vals = {
+                'sample_count': (resumen.sample_count if resumen else 0) + len(duraciones),
+                'weight': weight,
+                'duration_sum': duration_sum,
+                'latency_mean': duration_sum / weight if weight else 0.0,
+                'latency_min': min([resumen.latency_min] + duraciones) if resumen else min(duraciones),
+                'latency_max': max([resumen.latency_max] + duraciones) if resumen else max(duraciones),
+                'latency_p50': histogram.percentil(conteos, 50),
+                'latency_p95': histogram.percentil(conteos, 95),
+                'latency_p99': histogram.percentil(conteos, 99),
+                'last_duration': duraciones[-1],
+                'last_sample_at': ahora,
+                'histogram': json.dumps([round(c, 4) for c in conteos]),
+            }
+            if resumen:
+                resumen.write(vals)
+            else:
+                vals.update(endpoint_id=endpoint_id, environment_id=environment_id)
+                nuevos.append(vals)
+        if nuevos:
+            self.create(nuevos)
+        return pendientes
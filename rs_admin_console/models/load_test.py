@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api, _
+from odoo.exceptions import UserError, ValidationError
+from collections import Counter
+import json
+import logging
+import time
+
+from ..tools import load_runner, stats
+
+_logger = logging.getLogger(__name__)
+
+MAX_DURACION = 600
+MAX_CONCURRENCIA = 200
+# Tiempo extra sobre la duración configurada antes de dar por interrumpida una prueba 'running' (s)
+MARGEN_INTERRUMPIDA = 300
+
+
+class UhuuApiLoadTest(models.Model):
+    _name = 'uhuu.api.load.test'
+    _description = 'Prueba de carga de endpoint Uhuu'
+    _order = 'create_date desc'
+
+    name = fields.Char(string='Nombre', required=True, default=lambda self: _('Prueba de carga'))
+    endpoint_id = fields.Many2one('uhuu.api.endpoint', string='Endpoint', required=True, ondelete='cascade')
+    environment_id = fields.Many2one(
+        'uhuu.api.environment', string='Entorno', required=True,
+        default=lambda self: self.env['uhuu.api.environment'].search([('default', '=', True)], limit=1))
+    concurrency = fields.Integer(string='Concurrencia', default=10, required=True,
+                                 help="Número de clientes simultáneos (hilos), como máximo %s." % MAX_CONCURRENCIA)
+    target_rps = fields.Float(string='Peticiones por segundo', default=0,
+                              help="Límite global de peticiones por segundo. 0 = sin límite.")
+    ramp_up = fields.Integer(string='Rampa (s)', default=0,
+                             help="Segundos durante los que se van incorporando los clientes simultáneos.")
+    duration = fields.Integer(string='Duración (s)', default=30, required=True)
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('queued', 'En cola'),
+        ('running', 'Ejecutando'),
+        ('done', 'Terminada'),
+        ('failed', 'Fallida'),
+    ], string='Estado', default='draft', readonly=True)
+    started_at = fields.Datetime(string='Inicio', readonly=True)
+    finished_at = fields.Datetime(string='Fin', readonly=True)
+    elapsed = fields.Float(string='Tiempo real (s)', readonly=True, digits=(16, 2))
+    total_requests = fields.Integer(string='Peticiones', readonly=True)
+    success_count = fields.Integer(string='Exitosas', readonly=True)
+    error_count = fields.Integer(string='Errores', readonly=True)
+    error_rate = fields.Float(string='% Error', readonly=True, digits=(16, 2))
+    throughput = fields.Float(string='Peticiones/s', readonly=True, digits=(16, 2))
+    latency_min = fields.Float(string='Mín (s)', readonly=True, digits=(16, 3))
+    latency_mean = fields.Float(string='Media (s)', readonly=True, digits=(16, 3))
+    latency_p50 = fields.Float(string='p50 (s)', readonly=True, digits=(16, 3))
+    latency_p90 = fields.Float(string='p90 (s)', readonly=True, digits=(16, 3))
+    latency_p95 = fields.Float(string='p95 (s)', readonly=True, digits=(16, 3))
+    latency_p99 = fields.Float(string='p99 (s)', readonly=True, digits=(16, 3))
+    latency_max = fields.Float(string='Máx (s)', readonly=True, digits=(16, 3))
+    status_breakdown = fields.Text(string='Códigos de respuesta', readonly=True)
+    error_message = fields.Text(string='Error', readonly=True)
+
+    @api.constrains('concurrency', 'duration', 'ramp_up', 'target_rps')
+    def _check_parametros(self):
+        for rec in self:
+            if not 1 <= rec.concurrency <= MAX_CONCURRENCIA:
+                raise ValidationError(_("La concurrencia debe estar entre 1 y %s.") % MAX_CONCURRENCIA)
+            if not 0 < rec.duration <= MAX_DURACION:
+                raise ValidationError(_("La duración debe estar entre 1 y %s segundos.") % MAX_DURACION)
+            if rec.ramp_up < 0 or rec.ramp_up > rec.duration:
+                raise ValidationError(_("La rampa no puede ser negativa ni mayor que la duración."))
+            if rec.target_rps < 0:
+                raise ValidationError(_("Las peticiones por segundo no pueden ser negativas."))
+
+    @api.model
+    def _duracion_maxima(self):
+        # En workers prefork el cron muere al llegar a su límite de tiempo real
+        limite_cron = self.env['uhuu.api.run.job']._limite_tiempo_cron()
+        return min(MAX_DURACION, int(limite_cron * 0.8)) if limite_cron else MAX_DURACION
+
+    def action_ejecutar(self):
+        """Deja la prueba en cola: la ejecuta el cron de pruebas de carga, no la petición web."""
+        maxima = self._duracion_maxima()
+        for rec in self:
+            if rec.state in ('queued', 'running'):
+                raise UserError(_("La prueba '%s' ya está en cola o ejecutándose.") % rec.name)
+            if rec.duration > maxima:
+                raise UserError(_("Con el límite de tiempo del cron la duración máxima es de %s segundos.") % maxima)
+        self.write({'state': 'queued', 'started_at': False, 'finished_at': False, 'error_message': False})
+        self.env.ref('rs_admin_console.ir_cron_uhuu_load_test').sudo()._trigger()
+
+    def action_reiniciar(self):
+        self.write({'state': 'draft'})
+
+    @api.model
+    def cron_ejecutar_pruebas_carga(self):
+        """Ejecuta las pruebas en cola de una en una mientras quepan en el tiempo del cron."""
+        self._recuperar_interrumpidas()
+        self.env.cr.commit()
+        limite_cron = self.env['uhuu.api.run.job']._limite_tiempo_cron()
+        limite = time.time() + limite_cron * 0.8 if limite_cron else None
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM uhuu_api_load_test
+                 WHERE state = 'queued'
+                 ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            rec = self.browse(row[0])
+            if limite and time.time() + rec.duration > limite:
+                # No cabe en este ciclo: la toma la siguiente ejecución del cron
+                self.env.cr.rollback()
+                break
+            rec.write({'state': 'running', 'started_at': fields.Datetime.now()})
+            self.env.cr.commit()
+            rec._ejecutar()
+            self.env.cr.commit()
+
+    def _ejecutar(self):
+        self.ensure_one()
+        try:
+            endpoint = self.endpoint_id
+            token = None
+            if endpoint.endpoint_id_padre:
+                token, response_login = endpoint.endpoint_id_padre._obtener_token(self.environment_id)
+                if not token:
+                    raise UserError(_("No se pudo obtener token del login: %s") % response_login.get('token_error'))
+            peticion = endpoint._preparar_llamada(self.environment_id, token=token)
+            muestras, elapsed = load_runner.ejecutar_carga(
+                peticion, min(self.concurrency, MAX_CONCURRENCIA), min(self.duration, MAX_DURACION),
+                ramp_up=self.ramp_up, rps=self.target_rps)
+        except Exception as e:
+            _logger.exception("❌ Error en prueba de carga %s", self.name)
+            self.env.cr.rollback()
+            self.write({'state': 'failed', 'finished_at': fields.Datetime.now(), 'error_message': str(e)})
+            return
+        self.write(self._resumir_muestras(muestras, elapsed))
+
+    @api.model
+    def _recuperar_interrumpidas(self):
+        # Pruebas 'running' cuyo proceso murió (límite de tiempo, reinicio): se marcan como fallidas
+        self.env.cr.execute("""
+            UPDATE uhuu_api_load_test
+               SET state = 'failed', finished_at = now() AT TIME ZONE 'UTC',
+                   error_message = 'Prueba interrumpida: el proceso que la ejecutaba terminó antes de acabar.'
+             WHERE state = 'running'
+               AND started_at < (now() AT TIME ZONE 'UTC') - make_interval(secs => duration + %s)
+        """, (MARGEN_INTERRUMPIDA,))
+        self.invalidate_model()
+
+    @api.model
+    def _resumir_muestras(self, muestras, elapsed):
+        total = len(muestras)
+        exitosas = [s for s in muestras if 0 < s[0] < 400]
+        latencias = stats.resumen_latencias([s[1] for s in exitosas] or [s[1] for s in muestras])
+        codigos = Counter(str(s[0]) if s[0] else (s[2] or 'error') for s in muestras)
+        return {
+            'state': 'done',
+            'finished_at': fields.Datetime.now(),
+            'elapsed': elapsed,
+            'total_requests': total,
+            'success_count': len(exitosas),
+            'error_count': total - len(exitosas),
+            'error_rate': (total - len(exitosas)) / total * 100 if total else 0,
+            'throughput': total / elapsed if elapsed else 0,
+            'latency_min': latencias['min'],
+            'latency_mean': latencias['mean'],
+            'latency_p50': latencias['p50'],
+            'latency_p90': latencias['p90'],
+            'latency_p95': latencias['p95'],
+            'latency_p99': latencias['p99'],
+            'latency_max': latencias['max'],
+            'status_breakdown': json.dumps(dict(codigos.most_common()), indent=2),
+        }
@@ -1,67 +1,256 @@
-from odoo import models, fields, api
-import requests
-
-
-class ResConfigSettings(models.TransientModel):
-    _inherit = 'res.config.settings'
-
-    github_token = fields.Char(
-        string="GitHub Token",
-        config_parameter="client_consola.github_token"
-    )
-    github_repo = fields.Char(
-        string="Repositorio GitHub",
-        config_parameter="client_consola.github_repo",
-        default="MBP-Odoo/brokerlink"
-    )
-    github_branch = fields.Char(
-        string="Rama GitHub",
-        config_parameter="client_consola.github_branch",
-        default="main"
-    )
-
-    @api.model
-    def get_github_settings(self):
-        IrConfig = self.env['ir.config_parameter'].sudo()
-        return {
-            'token': IrConfig.get_param("client_consola.github_token"),
-            'repo': IrConfig.get_param("client_consola.github_repo"),
-            'branch': IrConfig.get_param("client_consola.github_branch"),
-        }
-
-    def action_test_github_connection(self):
-        self.ensure_one()
-        config = self.get_github_settings()
-
-        if not config['token'] or not config['repo'] or not config['branch']:
-            return self._return_message("❌ Faltan parámetros: token, repo o branch", "danger")
-
-        headers = {
-            "Authorization": f"token {config['token']}",
-            "Accept": "application/vnd.github+json"
-        }
-        url = f"https://api.github.com/repos/{config['repo']}/commits/{config['branch']}"
-
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                sha = response.json().get("sha")
-                return self._return_message(f"✅ Conexión exitosa. Último SHA: <code>{sha}</code>", "success")
-            else:
-                return self._return_message(
-                    f"❌ Error {response.status_code}: {response.text}", "danger"
-                )
-        except Exception as e:
-            return self._return_message(f"❌ Error de conexión: {str(e)}", "danger")
-
-    def _return_message(self, message, level):
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': 'Prueba de GitHub',
-                'message': message,
-                'type': level,
-                'sticky': False,
-            }
-        }
+from odoo import models, fields, api
+
+from ..tools import http_pool
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = 'res.config.settings'
+
+    github_token = fields.Char(
+        string="GitHub Token",
+        config_parameter="client_consola.github_token"
+    )
+    github_repo = fields.Char(
+        string="Repositorio GitHub",
+        config_parameter="client_consola.github_repo",
+        default="MBP-Odoo/brokerlink"
+    )
+    github_branch = fields.Char(
+        string="Rama GitHub",
+        config_parameter="client_consola.github_branch",
+        default="main"
+    )
+    github_webhook_secret = fields.Char(
+        string="Secreto del webhook de GitHub",
+        config_parameter="client_consola.github_webhook_secret",
+        help="Mismo secreto configurado en el webhook de GitHub (push) que apunta a /uhuu/github/webhook."
+    )
+    github_sha_ttl = fields.Integer(
+        string="Caché del SHA maestro (s)",
+        config_parameter="client_consola.github_sha_ttl",
+        default=60,
+        help="Durante este tiempo el SHA de la rama se reutiliza sin volver a consultar GitHub."
+    )
+    github_remote_workers = fields.Integer(
+        string="Consultas de SHA remoto en paralelo",
+        config_parameter="client_consola.github_remote_workers",
+        default=20,
+    )
+    github_remote_deadline = fields.Integer(
+        string="Tiempo máximo del sondeo de SHA remoto (s)",
+        config_parameter="client_consola.github_remote_deadline",
+        default=60,
+        help="Los clientes que no respondan dentro de este tiempo quedan marcados con error."
+    )
+    api_max_workers = fields.Integer(
+        string="Llamadas API concurrentes",
+        config_parameter="rs_admin_console.api_max_workers",
+        default=8,
+        help="Número máximo de endpoints que se prueban en paralelo por cliente. Usa 1 para ejecutar en serie."
+    )
+    http_pool_maxsize = fields.Integer(
+        string="Conexiones keep-alive por host",
+        config_parameter="rs_admin_console.http_pool_maxsize",
+        default=10,
+        help="Conexiones HTTP reutilizables que se mantienen abiertas por entorno o host remoto."
+    )
+    token_ttl = fields.Integer(
+        string="Vigencia del token de login (s)",
+        config_parameter="rs_admin_console.token_ttl",
+        default=900,
+        help="Se usa cuando la respuesta del login no indica su expiración (expires_in, exp o JWT)."
+    )
+    token_refresh_margin = fields.Integer(
+        string="Renovar token antes de expirar (s)",
+        config_parameter="rs_admin_console.token_refresh_margin",
+        default=60,
+    )
+    retention_days_success = fields.Integer(
+        string="Conservar resultados exitosos (días)",
+        config_parameter="rs_admin_console.retention_days_success",
+        default=7,
+        help="Pasado este plazo los resultados exitosos se resumen por día y se eliminan."
+    )
+    retention_days_failed = fields.Integer(
+        string="Conservar resultados fallidos (días)",
+        config_parameter="rs_admin_console.retention_days_failed",
+        default=30,
+        help="Pasado este plazo los resultados fallidos se resumen por día y se eliminan."
+    )
+    retention_batch_size = fields.Integer(
+        string="Tamaño de lote de retención",
+        config_parameter="rs_admin_console.retention_batch_size",
+        default=5000,
+    )
+    result_partitioned = fields.Boolean(
+        string="Resultados particionados por mes",
+        compute="_compute_result_partitioned",
+        help="La conversión se hace fuera de línea con odoo-bin shell (ver la descripción del módulo)."
+    )
+    api_full_sweep_hours = fields.Integer(
+        string="Barrido completo cada (h)",
+        config_parameter="rs_admin_console.api_full_sweep_hours",
+        default=24,
+        help="Las ejecuciones incrementales prueban todos los endpoints si el último barrido completo es más antiguo."
+    )
+    request_log_sample = fields.Float(
+        string="Muestreo del log de peticiones",
+        config_parameter="rs_admin_console.request_log_sample",
+        default=1.0,
+        help="Fracción (0-1) de peticiones que se registran cuando el logger "
+             "odoo.addons.rs_admin_console.tools.request_log está en DEBUG. Cabeceras y secretos se ocultan."
+    )
+    job_max_attempts = fields.Integer(
+        string="Intentos por ejecución en cola",
+        config_parameter="rs_admin_console.job_max_attempts",
+        default=3,
+    )
+    job_time_budget = fields.Integer(
+        string="Tiempo máximo por ejecución (s)",
+        config_parameter="rs_admin_console.job_time_budget",
+        default=300,
+        help="Pasado este tiempo la ejecución de un cliente deja de lanzar nuevas llamadas HTTP."
+    )
+    queue_worker_budget = fields.Integer(
+        string="Tiempo por ciclo de worker (s)",
+        config_parameter="rs_admin_console.queue_worker_budget",
+        default=240,
+        help="Tiempo que cada cron worker sigue tomando trabajos de la cola antes de terminar su ciclo. "
+             "Con workers prefork, este tiempo y el de cada ejecución se recortan al límite de tiempo real "
+             "del cron (limit_time_real_cron / limit_time_real)."
+    )
+    job_retention_days = fields.Integer(
+        string="Conservar ejecuciones terminadas (días)",
+        config_parameter="rs_admin_console.job_retention_days",
+        default=90,
+        help="Las ejecuciones terminadas o fallidas de la cola se eliminan pasado este plazo. 0 = conservarlas."
+    )
+    latency_decay = fields.Float(
+        string="Decaimiento del histograma de latencia",
+        config_parameter="rs_admin_console.latency_decay",
+        default=0.99,
+        help="Peso que conserva cada muestra anterior al llegar una nueva (0.99 ≈ últimas 100 muestras)."
+    )
+
+    ai_api_key = fields.Char(
+        string="Clave API de IA",
+        config_parameter="rs_admin_console.openai_key",
+    )
+    ai_provider_url = fields.Char(
+        string="URL del proveedor de IA",
+        config_parameter="rs_admin_console.ai_provider_url",
+        default="https://api.openai.com/v1/chat/completions",
+        help="Endpoint compatible con chat/completions de OpenAI; puede apuntar a un servicio local."
+    )
+    ai_model = fields.Char(
+        string="Modelo de IA",
+        config_parameter="rs_admin_console.ai_model",
+        default="gpt-3.5-turbo",
+    )
+    ai_max_workers = fields.Integer(
+        string="Consultas de IA en paralelo",
+        config_parameter="rs_admin_console.ai_max_workers",
+        default=4,
+    )
+    ai_batch_size = fields.Integer(
+        string="Tamaño de lote de consultas de IA",
+        config_parameter="rs_admin_console.ai_batch_size",
+        default=20,
+        help="Errores distintos sin explicación en caché que se consultan por lote; cada lote se guarda al terminar."
+    )
+    ai_timeout = fields.Integer(
+        string="Tiempo máximo por consulta de IA (s)",
+        config_parameter="rs_admin_console.ai_timeout",
+        default=20,
+    )
+
+    def _compute_result_partitioned(self):
+        self.result_partitioned = self.env['uhuu.api.test.result'].sudo()._es_particionada()
+
+    @api.model
+    def get_api_settings(self):
+        IrConfig = self.env['ir.config_parameter'].sudo()
+        return {
+            'max_workers': int(IrConfig.get_param("rs_admin_console.api_max_workers", default=8) or 1),
+            'pool_maxsize': int(IrConfig.get_param("rs_admin_console.http_pool_maxsize", default=10) or 1),
+            'token_ttl': int(IrConfig.get_param("rs_admin_console.token_ttl", default=900) or 0),
+            'token_refresh_margin': int(IrConfig.get_param("rs_admin_console.token_refresh_margin", default=60) or 0),
+            'retention_days_success': int(IrConfig.get_param("rs_admin_console.retention_days_success", default=7) or 0),
+            'retention_days_failed': int(IrConfig.get_param("rs_admin_console.retention_days_failed", default=30) or 0),
+            'retention_batch_size': int(IrConfig.get_param("rs_admin_console.retention_batch_size", default=5000) or 1000),
+            'full_sweep_hours': int(IrConfig.get_param("rs_admin_console.api_full_sweep_hours", default=24) or 24),
+            'request_log_sample': min(max(float(IrConfig.get_param("rs_admin_console.request_log_sample", default=1.0) or 0.0), 0.0), 1.0),
+            'job_max_attempts': int(IrConfig.get_param("rs_admin_console.job_max_attempts", default=3) or 1),
+            'job_time_budget': int(IrConfig.get_param("rs_admin_console.job_time_budget", default=300) or 0),
+            'queue_worker_budget': int(IrConfig.get_param("rs_admin_console.queue_worker_budget", default=240) or 60),
+            'job_retention_days': int(IrConfig.get_param("rs_admin_console.job_retention_days", default=90) or 0),
+            'latency_decay': min(max(float(IrConfig.get_param("rs_admin_console.latency_decay", default=0.99) or 1.0), 0.0), 1.0),
+        }
+
+    @api.model
+    def get_ai_settings(self):
+        IrConfig = self.env['ir.config_parameter'].sudo()
+        return {
+            'api_key': IrConfig.get_param("rs_admin_console.openai_key"),
+            'provider_url': IrConfig.get_param("rs_admin_console.ai_provider_url")
+            or "https://api.openai.com/v1/chat/completions",
+            'model': IrConfig.get_param("rs_admin_console.ai_model") or "gpt-3.5-turbo",
+            'max_workers': int(IrConfig.get_param("rs_admin_console.ai_max_workers", default=4) or 1),
+            'batch_size': int(IrConfig.get_param("rs_admin_console.ai_batch_size", default=20) or 20),
+            'timeout': int(IrConfig.get_param("rs_admin_console.ai_timeout", default=20) or 20),
+        }
+
+    @api.model
+    def get_github_settings(self):
+        IrConfig = self.env['ir.config_parameter'].sudo()
+        return {
+            'token': IrConfig.get_param("client_consola.github_token"),
+            'repo': IrConfig.get_param("client_consola.github_repo"),
+            'branch': IrConfig.get_param("client_consola.github_branch"),
+            'webhook_secret': IrConfig.get_param("client_consola.github_webhook_secret"),
+            'sha_ttl': int(IrConfig.get_param("client_consola.github_sha_ttl", default=60) or 0),
+            'remote_workers': int(IrConfig.get_param("client_consola.github_remote_workers", default=20) or 1),
+            'remote_deadline': int(IrConfig.get_param("client_consola.github_remote_deadline", default=60) or 60),
+        }
+
+    def action_test_github_connection(self):
+        self.ensure_one()
+        config = self.get_github_settings()
+
+        if not config['token'] or not config['repo'] or not config['branch']:
+            return self._return_message("❌ Faltan parámetros: token, repo o branch", "danger")
+
+        headers = {
+            "Authorization": f"token {config['token']}",
+            "Accept": "application/vnd.github+json"
+        }
+        url = f"https://api.github.com/repos/{config['repo']}/commits/{config['branch']}"
+
+        try:
+            response = self._get_http_session(url).get(url, headers=headers, timeout=10)
+            if response.status_code == 200:
+                sha = response.json().get("sha")
+                return self._return_message(f"✅ Conexión exitosa. Último SHA: <code>{sha}</code>", "success")
+            else:
+                return self._return_message(
+                    f"❌ Error {response.status_code}: {response.text}", "danger"
+                )
+        except Exception as e:
+            return self._return_message(f"❌ Error de conexión: {str(e)}", "danger")
+
+    @api.model
+    def _get_http_session(self, url):
+        pool_maxsize = self.get_api_settings()['pool_maxsize']
+        return http_pool.get_session(http_pool.clave_host(self.env.cr.dbname, url), pool_maxsize)
+
+    def _return_message(self, message, level):
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Prueba de GitHub',
+                'message': message,
+                'type': level,
+                'sticky': False,
+            }
+        }
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+import base64
+import hashlib
+import logging
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+
+class UhuuApiResponseBlob(models.Model):
+    _name = 'uhuu.api.response.blob'
+    _description = 'Cuerpo de respuesta Uhuu comprimido y deduplicado'
+    _rec_name = 'hash'
+
+    hash = fields.Char(string='SHA-256', required=True, readonly=True, index=True)
+    data = fields.Binary(string='Contenido comprimido', attachment=False, readonly=True)
+    size = fields.Integer(string='Tamaño original (bytes)', readonly=True)
+    compressed_size = fields.Integer(string='Tamaño comprimido (bytes)', readonly=True)
+    texto = fields.Text(string='Contenido', compute='_compute_texto')
+
+    _sql_constraints = [
+        ('hash_uniq', 'unique(hash)', 'Ya existe un cuerpo de respuesta con este hash.'),
+    ]
+
+    @api.depends('data')
+    def _compute_texto(self):
+        # Lectura directa en SQL: con bin_size en el contexto (vistas web) el ORM devolvería solo el tamaño
+        datos = {}
+        ids = [rec_id for rec_id in self.ids if isinstance(rec_id, int)]
+        if ids:
+            self.env.cr.execute("SELECT id, data FROM uhuu_api_response_blob WHERE id IN %s", (tuple(ids),))
+            datos = {rec_id: data for rec_id, data in self.env.cr.fetchall()}
+        for rec in self:
+            data = datos.get(rec.id)
+            rec.texto = zlib.decompress(base64.b64decode(bytes(data))).decode('utf-8') if data else False
+
+    @api.model
+    def _guardar(self, textos):
+        """Devuelve ``{texto: blob_id}`` guardando una sola vez (comprimido) cada cuerpo distinto."""
+        por_hash = {}
+        for texto in textos:
+            if texto:
+                por_hash.setdefault(hashlib.sha256(texto.encode('utf-8')).hexdigest(), texto)
+        if not por_hash:
+            return {}
+
+        # FOR KEY SHARE: el cuerpo reutilizado no puede purgarse hasta que se confirme esta transacción.
+        # SKIP LOCKED: si la purga ya lo tiene bloqueado para borrarlo, se trata como nuevo y se reinserta
+        self.env.cr.execute("""
+            SELECT hash, id FROM uhuu_api_response_blob WHERE hash IN %s
+               FOR KEY SHARE SKIP LOCKED
+        """, (tuple(por_hash),))
+        ids_por_hash = dict(self.env.cr.fetchall())
+        nuevos = [h for h in por_hash if h not in ids_por_hash]
+        for h in nuevos:
+            contenido = por_hash[h].encode('utf-8')
+            comprimido = zlib.compress(contenido, 6)
+            # ON CONFLICT: otro worker pudo insertar el mismo cuerpo en paralelo
+            self.env.cr.execute("""
+                INSERT INTO uhuu_api_response_blob
+                    (hash, data, size, compressed_size, create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, %s, %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC')
+                ON CONFLICT (hash) DO NOTHING
+             RETURNING id
+            """, (h, base64.b64encode(comprimido), len(contenido), len(comprimido), self.env.uid, self.env.uid))
+            row = self.env.cr.fetchone()
+            if row:
+                ids_por_hash[h] = row[0]
+        insertados_por_otros = [h for h in nuevos if h not in ids_por_hash]
+        if insertados_por_otros:
+            self.env.cr.execute("""
+                SELECT hash, id FROM uhuu_api_response_blob WHERE hash IN %s
+                   FOR KEY SHARE
+            """, (tuple(insertados_por_otros),))
+            ids_por_hash.update(self.env.cr.fetchall())
+        return {texto: ids_por_hash[h] for h, texto in por_hash.items()}
+
+    @api.model
+    def _vals_con_blob(self, vals_list):
+        # Sustituye 'response' por 'response_blob_id' en una lista de vals de create/write
+        textos = [vals['response'] for vals in vals_list if 'response' in vals]
+        if not textos:
+            return vals_list
+        blob_ids = self._guardar(textos)
+        for vals in vals_list:
+            if 'response' in vals:
+                vals['response_blob_id'] = blob_ids.get(vals.pop('response')) or False
+        return vals_list
+
+    @api.model
+    def _purgar_huerfanos(self, antiguedad_dias=1):
+        # Borra cuerpos que ya no referencia ningún resultado ni endpoint
+        try:
+            with self.env.cr.savepoint():
+                # FOR UPDATE SKIP LOCKED: no toca los cuerpos que una ejecución en curso acaba de reutilizar
+                # (los bloquea _guardar con FOR KEY SHARE hasta confirmar sus resultados)
+                self.env.cr.execute("""
+                    DELETE FROM uhuu_api_response_blob
+                     WHERE id IN (
+                         SELECT b.id FROM uhuu_api_response_blob b
+                          WHERE b.create_date < (now() AT TIME ZONE 'UTC') - make_interval(days => %s)
+                            AND NOT EXISTS (SELECT 1 FROM uhuu_api_test_result r WHERE r.response_blob_id = b.id)
+                            AND NOT EXISTS (SELECT 1 FROM uhuu_api_endpoint e WHERE e.response_blob_id = b.id)
+                            FOR UPDATE OF b SKIP LOCKED)
+                """, (antiguedad_dias,))
+                _logger.info("🧹 Cuerpos de respuesta huérfanos eliminados: %s", self.env.cr.rowcount)
+        except Exception as e:
+            # Cualquier otro conflicto deja los huérfanos para la próxima ejecución
+            _logger.warning("⚠️ No se pudieron purgar cuerpos de respuesta huérfanos: %s", e)
+        self.invalidate_model()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+from odoo.tools import config
+import json
+import logging
+from markupsafe import escape
+import os
+import socket
+import time
+
+from .run_job_line import MOTIVOS_SELECCION
+
+_logger = logging.getLogger(__name__)
+
+# Trabajos sin tiempo máximo: se dan por huérfanos si siguen 'running' pasado este tiempo (s)
+TIMEOUT_HUERFANO = 3600
+# Margen antes del límite de tiempo real del cron para cerrar el trabajo en curso y confirmar (s)
+MARGEN_LIMITE_CRON = 20
+
+
+class UhuuApiRunJob(models.Model):
+    _name = 'uhuu.api.run.job'
+    _description = 'Trabajo en cola de ejecución de pruebas por cliente'
+    _order = 'scheduled_at desc, id desc'
+
+    client_id = fields.Many2one('client.consola', string='Cliente', required=True, index=True, ondelete='cascade')
+    partner_id = fields.Many2one(related='client_id.partner_id', store=True)
+    job_type = fields.Selection(
+        [('api_tests', 'Pruebas API'), ('module_scan', 'Escaneo de módulos')],
+        string='Tipo', required=True, default='api_tests')
+    mode = fields.Selection([
+        ('incremental', 'Incremental'),
+        ('full', 'Completa'),
+    ], string='Modo', required=True, default='incremental',
+        help="Incremental: solo endpoints modificados, fallidos o de clientes con cambios; "
+             "se hace un barrido completo periódicamente.")
+    state = fields.Selection([
+        ('queued', 'En cola'),
+        ('running', 'Ejecutando'),
+        ('done', 'Terminado'),
+        ('failed', 'Fallido'),
+    ], string='Estado', required=True, default='queued', index=True)
+    scheduled_at = fields.Datetime(string='Programado para', required=True, default=fields.Datetime.now, index=True)
+    started_at = fields.Datetime(string='Inicio')
+    finished_at = fields.Datetime(string='Fin')
+    duration = fields.Float(string='Duración (s)', digits=(16, 2))
+    orm_duration = fields.Float(string='Registro de resultados (s)', digits=(16, 3), readonly=True,
+                                help="Tiempo de guardado de los resultados del lote: inserción, resúmenes y latencias")
+    attempts = fields.Integer(string='Intentos', default=0)
+    max_attempts = fields.Integer(string='Intentos máximos', default=3)
+    time_budget = fields.Integer(string='Tiempo máximo (s)', default=300,
+                                 help="Pasado este tiempo la ejecución deja de lanzar nuevas llamadas HTTP.")
+    worker = fields.Char(string='Worker', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+    line_ids = fields.One2many('uhuu.api.run.job.line', 'job_id', string='Endpoints ejecutados', readonly=True)
+    endpoint_run_count = fields.Integer(string='Ejecutados', readonly=True)
+    endpoint_skipped_count = fields.Integer(string='Omitidos', readonly=True)
+    # Los omitidos no se guardan como líneas: un JSON compacto {motivo: [endpoint_ids]}
+    skipped_endpoints = fields.Text(string='Omitidos por motivo (JSON)', readonly=True)
+    skip_summary = fields.Html(string='Endpoints omitidos', compute='_compute_skip_summary', sanitize=True)
+
+    @api.depends('skipped_endpoints')
+    def _compute_skip_summary(self):
+        etiquetas = dict(MOTIVOS_SELECCION)
+        for job in self:
+            omitidos = json.loads(job.skipped_endpoints) if job.skipped_endpoints else {}
+            ids = [endpoint_id for endpoint_ids in omitidos.values() for endpoint_id in endpoint_ids]
+            nombres = {ep.id: ep.name for ep in self.env['uhuu.api.endpoint'].browse(ids).exists()}
+            job.skip_summary = "".join(
+                f"<p><b>{escape(etiquetas.get(motivo, motivo))}</b> ({len(endpoint_ids)}): "
+                f"{escape(', '.join(nombres.get(endpoint_id, f'#{endpoint_id}') for endpoint_id in endpoint_ids))}</p>"
+                for motivo, endpoint_ids in sorted(omitidos.items())) or False
+
+    @api.model
+    def _encolar(self, clients, job_type='api_tests', scheduled_at=None, mode='incremental'):
+        # No duplica trabajos: los clientes con uno pendiente o en ejecución se omiten
+        if not clients:
+            return self.browse()
+        pendientes = self.search([
+            ('client_id', 'in', clients.ids),
+            ('job_type', '=', job_type),
+            ('state', 'in', ('queued', 'running')),
+        ]).client_id
+        settings = self.env['res.config.settings'].get_api_settings()
+        return self.create([{
+            'client_id': client.id,
+            'job_type': job_type,
+            'mode': mode,
+            'scheduled_at': scheduled_at or fields.Datetime.now(),
+            'max_attempts': settings['job_max_attempts'],
+            'time_budget': settings['job_time_budget'],
+        } for client in clients - pendientes])
+
+    @api.model
+    def _reclamar(self, worker):
+        """Toma el siguiente trabajo pendiente con SKIP LOCKED, de modo que varios workers
+        (crons o nodos Odoo) pueden consumir la cola sin pisarse."""
+        self.env.cr.execute("""
+            UPDATE uhuu_api_run_job
+               SET state = 'running', started_at = now() AT TIME ZONE 'UTC', finished_at = NULL,
+                   attempts = attempts + 1, worker = %s, error = NULL
+             WHERE id = (
+                 SELECT id FROM uhuu_api_run_job
+                  WHERE state = 'queued' AND scheduled_at <= now() AT TIME ZONE 'UTC'
+                  ORDER BY scheduled_at, id
+                  LIMIT 1
+                    FOR UPDATE SKIP LOCKED)
+         RETURNING id
+        """, (worker,))
+        row = self.env.cr.fetchone()
+        self.invalidate_model()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _recuperar_huerfanos(self):
+        # Trabajos 'running' de un worker caído: vuelven a la cola pasado el doble de su tiempo máximo
+        # (o TIMEOUT_HUERFANO si no tienen), nunca antes de que el cron los haya podido terminar
+        self.env.cr.execute("""
+            UPDATE uhuu_api_run_job
+               SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                   error = 'Worker interrumpido: trabajo recuperado de la cola.'
+             WHERE state = 'running'
+               AND started_at < (now() AT TIME ZONE 'UTC') - make_interval(
+                   secs => CASE WHEN time_budget > 0 THEN time_budget * 2 ELSE %s END)
+        """, (TIMEOUT_HUERFANO,))
+        self.invalidate_model()
+
+    @api.model
+    def _limite_tiempo_cron(self):
+        """Segundos que el servidor deja correr un cron antes de matarlo, o None si no hay límite.
+
+        Solo aplica en modo prefork (``workers`` > 0): ``limit_time_real_cron``, o ``limit_time_real``
+        si vale -1; 0 significa sin límite.
+        """
+        if not config.get('workers'):
+            return None
+        limite = config.get('limit_time_real_cron', -1)
+        if limite is None or limite < 0:
+            limite = config.get('limit_time_real') or 0
+        return limite or None
+
+    @api.model
+    def _purgar_vencidos(self, limite, lote=5000):
+        """Elimina por lotes los trabajos terminados o fallidos antes de ``limite`` (y sus líneas)."""
+        total = 0
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM uhuu_api_run_job
+                 WHERE id IN (
+                     SELECT id FROM uhuu_api_run_job
+                      WHERE state IN ('done', 'failed') AND finished_at < %s
+                      LIMIT %s
+                        FOR UPDATE SKIP LOCKED)
+            """, (limite, lote))
+            borrados = self.env.cr.rowcount
+            self.env.cr.commit()
+            total += borrados
+            if borrados < lote:
+                break
+        if total:
+            _logger.info("🧹 Retención: %s trabajos de la cola terminados eliminados", total)
+        self.invalidate_model()
+
+    def _ejecutar(self, limite=None):
+        """Ejecuta el trabajo; ``limite`` (epoch) recorta su tiempo máximo al que le queda al cron."""
+        self.ensure_one()
+        deadline = time.time() + self.time_budget if self.time_budget else None
+        if limite:
+            deadline = min(deadline, limite) if deadline else limite
+        client = self.client_id.with_context(deadline=deadline, api_test_mode=self.mode, run_job_id=self.id)
+        if self.job_type == 'api_tests':
+            client.action_ejecutar_pruebas_api()
+        elif self.job_type == 'module_scan':
+            client.action_actualizar_modulos_repo()
+
+    @api.model
+    def cron_procesar_cola(self):
+        """Consume trabajos de la cola hasta agotar el presupuesto de tiempo del cron."""
+        settings = self.env['res.config.settings'].get_api_settings()
+        limite = time.time() + settings['queue_worker_budget']
+        # Con un límite de tiempo real el servidor mataría el cron a mitad de un trabajo, que quedaría
+        # 'running' hasta su recuperación: el ciclo y cada trabajo terminan antes de ese límite
+        limite_cron = self._limite_tiempo_cron()
+        limite_duro = time.time() + max(limite_cron - MARGEN_LIMITE_CRON, limite_cron / 2) if limite_cron else None
+        if limite_duro:
+            limite = min(limite, limite_duro)
+        worker = f"{socket.gethostname()}-{os.getpid()}"
+        self._recuperar_huerfanos()
+        self.env.cr.commit()
+
+        while time.time() < limite:
+            job = self._reclamar(worker)
+            self.env.cr.commit()
+            if not job:
+                break
+            inicio = time.time()
+            try:
+                job._ejecutar(limite=limite_duro)
+                job.write({
+                    'state': 'done',
+                    'finished_at': fields.Datetime.now(),
+                    'duration': time.time() - inicio,
+                })
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("❌ Error en trabajo %s del cliente %s", job.id, job.client_id.display_name)
+                reintentar = job.attempts < job.max_attempts
+                job.write({
+                    'state': 'queued' if reintentar else 'failed',
+                    # Reintento con espera exponencial: 1, 2, 4... minutos
+                    'scheduled_at': fields.Datetime.add(fields.Datetime.now(), minutes=2 ** (job.attempts - 1)),
+                    'finished_at': fields.Datetime.now(),
+                    'duration': time.time() - inicio,
+                    'error': f"{type(e).__name__}: {str(e)}",
+                })
+                if not reintentar:
+                    job.client_id.write({'state': 'failed'})
+                    job.client_id.message_post(body=f"❌ Error al ejecutar pruebas automáticas: {str(e)}")
+            self.env.cr.commit()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Motivo por el que un endpoint se ejecuta u omite en una ejecución
+MOTIVOS_SELECCION = [
+    ('full', 'Barrido completo'),
+    ('new', 'Sin resultado previo'),
+    ('definition', 'Definición modificada'),
+    ('failed', 'Falló la última vez'),
+    ('client_changed', 'Cambió SHA o módulos del cliente'),
+    ('unchanged', 'Sin cambios desde el último éxito'),
+]
+
+
+class UhuuApiRunJobLine(models.Model):
+    _name = 'uhuu.api.run.job.line'
+    _description = 'Endpoint ejecutado en una ejecución de la cola'
+    _order = 'id'
+
+    job_id = fields.Many2one('uhuu.api.run.job', string='Ejecución', required=True, index=True, ondelete='cascade')
+    endpoint_id = fields.Many2one('uhuu.api.endpoint', string='Endpoint', required=True, ondelete='cascade')
+    reason = fields.Selection(MOTIVOS_SELECCION, string='Motivo', required=True)
+    success = fields.Boolean(string='Exitoso')
+
+    @api.model
+    def _purgar_vencidas(self, limite, lote=5000):
+        """Elimina por lotes las líneas de ejecuciones terminadas antes de ``limite``."""
+        total = 0
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM uhuu_api_run_job_line
+                 WHERE id IN (
+                     SELECT l.id FROM uhuu_api_run_job_line l
+                       JOIN uhuu_api_run_job j ON j.id = l.job_id
+                      WHERE j.finished_at < %s
+                      LIMIT %s
+                        FOR UPDATE OF l SKIP LOCKED)
+            """, (limite, lote))
+            borradas = self.env.cr.rowcount
+            self.env.cr.commit()
+            total += borradas
+            if borradas < lote:
+                break
+        if total:
+            _logger.info("🧹 Retención: %s líneas de selección de endpoints eliminadas", total)
+        self.invalidate_model()
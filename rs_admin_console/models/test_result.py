@@ -1,82 +1,469 @@
-# -*- coding: utf-8 -*-
-from odoo import fields, models, api, _
-import requests
-from odoo.exceptions import UserError
-from odoo.tools import config
-
-
-class UhuuApiTestResult(models.Model):
-    _name = 'uhuu.api.test.result'
-    _description = 'Resultado de prueba de endpoint Uhuu'
-    _order = 'create_date desc'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
-
-    endpoint_id = fields.Many2one('uhuu.api.endpoint', required=True)
-    environment_id = fields.Many2one('uhuu.api.environment', required=True)
-    partner_id = fields.Many2one(
-        'res.partner', string='Cliente asociado',
-        help="Cliente asociado a este resultado de prueba, si aplica",
-        tracking=True)
-    status_code = fields.Integer()
-    success = fields.Boolean()
-    response = fields.Text()
-    comentario_ia = fields.Text(string="Comentario IA")
-    tested_at = fields.Datetime(default=fields.Datetime.now)
-    state = fields.Selection(
-        [('test_ok', 'Test OK'),
-         ('test_failed', 'Test Failed')],
-        string='Estado', tracking=True)
-
-    def accion_comentario_ia(self):
-        for record in self:
-            if not record.success:
-                comentario = record.obtener_explicacion_ia(
-                    status_code=record.status_code,
-                    response_text=record.response or ""
-                )
-                record.comentario_ia = comentario
-
-    def obtener_explicacion_ia(self, status_code, response_text):
-        api_key = self.env['ir.config_parameter'].sudo().get_param('rs_admin_console.openai_key')
-        if not api_key:
-            return "No se configuró la clave API de OpenAI."
-
-        prompt = (
-            f"Estoy probando una API que se conectar a odoo version 17 comunity y obtengo un error {status_code} con este cuerpo de respuesta: "
-            f"{response_text}. ¿Cuál puede ser la causa probable y cómo lo corrijo?"
-        )
-
-        try:
-            res = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    "model": "gpt-3.5-turbo",
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                timeout=20
-            )
-            result = res.json()
-            return result.get("choices", [{}])[0].get("message", {}).get("content", "Sin respuesta de IA")
-        except Exception as e:
-            return f"Error al consultar OpenAI: {str(e)}"
-
-    # @api.model
-    # def create(self, vals):
-    #     endpoint = self.env['uhuu.api.endpoint'].browse(vals.get('endpoint_id'))
-    #     if endpoint:
-    #         # Copia partner según si es login o no
-    #         if endpoint.type_login:
-    #             vals['partner_id'] = endpoint.partner_id.id
-    #         elif endpoint.endpoint_id_padre:
-    #             vals['partner_id'] = endpoint.endpoint_id_padre.partner_id.id
-    #
-    #         # Copia el estado del endpoint al resultado
-    #         vals['state'] = endpoint.state or 'test_failed'
-    #
-    #     return super(UhuuApiTestResult, self).create(vals)
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api, _
+import requests
+import logging
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+
+from odoo.sql_db import db_connect
+
+from .api_end_point import CONTEXTO_LOTE
+from ..tools import firma_error
+
+_logger = logging.getLogger(__name__)
+
+# Índices compuestos de los accesos habituales: resultados por cliente y por endpoint ordenados
+# por fecha, filtros por estado/éxito (retención, tableros) y último resultado de cada endpoint
+INDICES = {
+    'uhuu_api_test_result_partner_date_idx': '(partner_id, create_date DESC)',
+    'uhuu_api_test_result_endpoint_date_idx': '(endpoint_id, create_date DESC)',
+    'uhuu_api_test_result_state_success_idx': '(success, state, create_date)',
+    'uhuu_api_test_result_retention_idx': '(success, create_date)',
+    'uhuu_api_test_result_last_result_idx': '(partner_id, environment_id, endpoint_id, tested_at DESC)',
+}
+PROVEEDOR_IA_DEFAULT = 'https://api.openai.com/v1/chat/completions'
+# Por encima de estas filas los índices no se crean al actualizar (bloquearía la tabla): los crea
+# la migración con CREATE INDEX CONCURRENTLY
+MAX_FILAS_INDICE_SINCRONO = 200000
+# Particiones mensuales que se mantienen creadas por delante del mes en curso
+MESES_PARTICION_ADELANTO = 2
+
+
+def crear_indices_concurrentes(dbname):
+    """Crea los índices que falten con CREATE INDEX CONCURRENTLY desde una conexión en autocommit.
+
+    Espera a que terminen las transacciones abiertas (p. ej. la de la actualización del módulo),
+    así que se lanza en un hilo aparte. Un índice que falle se elimina para no dejarlo inválido, y
+    los que quedaron inválidos de un intento anterior se reconstruyen.
+    """
+    with db_connect(dbname).cursor() as cr:
+        cr._cnx.autocommit = True
+        try:
+            cr.execute("""
+                SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                 WHERE i.indrelid = 'uhuu_api_test_result'::regclass AND c.relname IN %s AND NOT i.indisvalid
+            """, (tuple(INDICES),))
+            for (nombre,) in cr.fetchall():
+                cr.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{nombre}"')
+            for nombre, columnas in INDICES.items():
+                try:
+                    _logger.info("🗂️ Creando índice %s de forma concurrente", nombre)
+                    cr.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{nombre}" ON uhuu_api_test_result {columnas}')
+                except Exception:
+                    _logger.exception("❌ No se pudo crear el índice %s", nombre)
+                    cr.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{nombre}"')
+        finally:
+            # La conexión vuelve al pool de Odoo: no debe quedar en autocommit
+            cr._cnx.autocommit = False
+
+
+class UhuuApiTestResult(models.Model):
+    _name = 'uhuu.api.test.result'
+    _description = 'Resultado de prueba de endpoint Uhuu'
+    _order = 'create_date desc'
+    _inherit = ['mail.thread', 'mail.activity.mixin']
+
+    endpoint_id = fields.Many2one('uhuu.api.endpoint', required=True)
+    environment_id = fields.Many2one('uhuu.api.environment', required=True)
+    partner_id = fields.Many2one(
+        'res.partner', string='Cliente asociado',
+        help="Cliente asociado a este resultado de prueba, si aplica",
+        tracking=True)
+    status_code = fields.Integer()
+    success = fields.Boolean()
+    response_blob_id = fields.Many2one(
+        'uhuu.api.response.blob', string='Cuerpo de respuesta', readonly=True, index=True, ondelete='restrict')
+    response = fields.Text(compute='_compute_response', inverse='_inverse_response')
+    response_size = fields.Integer(string='Tamaño de respuesta (bytes)', readonly=True)
+    response_hash = fields.Char(string='SHA-256 de la respuesta', readonly=True,
+                                help="Hash del cuerpo completo, aunque solo se haya guardado su inicio")
+    response_truncated = fields.Boolean(string='Respuesta truncada', readonly=True)
+    duration = fields.Float(string='Duración (s)', digits=(16, 3), group_operator='avg')
+    # Fases de la llamada: conexión (DNS + TCP), TLS, espera de la primera respuesta y descarga
+    timing_connect = fields.Float(string='Conexión (s)', digits=(16, 4), group_operator='avg')
+    timing_tls = fields.Float(string='TLS (s)', digits=(16, 4), group_operator='avg')
+    timing_ttfb = fields.Float(string='Primer byte (s)', digits=(16, 4), group_operator='avg',
+                               help="Espera de la respuesta del API remoto, sin conexión ni TLS")
+    timing_transfer = fields.Float(string='Descarga (s)', digits=(16, 4), group_operator='avg')
+    comentario_ia = fields.Text(string="Comentario IA")
+    tested_at = fields.Datetime(default=fields.Datetime.now)
+    state = fields.Selection(
+        [('test_ok', 'Test OK'),
+         ('test_failed', 'Test Failed'),
+         ('test_blocked', 'Bloqueado')],
+        string='Estado', tracking=True)
+
+    @api.depends('response_blob_id')
+    def _compute_response(self):
+        for rec in self:
+            rec.response = rec.response_blob_id.texto
+
+    def _inverse_response(self):
+        blob_ids = self.env['uhuu.api.response.blob']._guardar(self.mapped('response'))
+        for rec in self:
+            rec.response_blob_id = blob_ids.get(rec.response) or False
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Los cuerpos se guardan deduplicados en lote antes de insertar los resultados
+        return super().create(self.env['uhuu.api.response.blob']._vals_con_blob(vals_list))
+
+    @api.model
+    def _preparar_vals(self, endpoint, environment, partner, resultado):
+        return {
+            'endpoint_id': endpoint.id,
+            'environment_id': environment.id,
+            'partner_id': partner.id if partner else False,
+            'status_code': resultado.get('status_code'),
+            'success': resultado.get('success'),
+            'response': resultado.get('response'),
+            'response_size': resultado.get('response_size'),
+            'response_hash': resultado.get('response_hash'),
+            'response_truncated': resultado.get('response_truncated', False),
+            'state': 'test_blocked' if 'blocked_by' in resultado
+            else 'test_ok' if resultado.get('success') else 'test_failed',
+            'duration': resultado.get('duration'),
+            'timing_connect': resultado.get('timing_connect'),
+            'timing_tls': resultado.get('timing_tls'),
+            'timing_ttfb': resultado.get('timing_ttfb'),
+            'timing_transfer': resultado.get('timing_transfer'),
+        }
+
+    @api.model
+    def _registrar_resultados(self, vals_list):
+        # Un único create multi-fila sin tracking, seguidores ni mensaje de creación en el chatter
+        if not vals_list:
+            return self.browse()
+        inicio = time.time()
+        resultados = self.with_context(
+            tracking_disable=True,
+            mail_create_nolog=True,
+            mail_create_nosubscribe=True,
+            mail_notrack=True,
+        ).create(vals_list)
+        self.env['uhuu.api.test.result.hourly']._acumular(resultados.ids)
+        self.env['uhuu.api.latency.summary']._registrar_duraciones([
+            (vals.get('endpoint_id'), vals.get('environment_id'), vals.get('duration')) for vals in vals_list
+        ])
+        # El tiempo de registro es del lote completo: se guarda una vez en la ejecución de la cola
+        # (si la hay), no en cada resultado
+        self.flush_model()
+        duracion_orm = time.time() - inicio
+        _logger.debug("💾 %s resultados registrados en %.3fs", len(resultados), duracion_orm)
+        job_id = self.env.context.get('run_job_id')
+        if job_id:
+            job = self.env['uhuu.api.run.job'].browse(job_id)
+            job.orm_duration += duracion_orm
+        return resultados
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute("SELECT reltuples, relkind FROM pg_class WHERE oid = %s::regclass", (self._table,))
+        filas, relkind = cr.fetchone()
+        # Un CREATE INDEX CONCURRENTLY interrumpido deja el índice INVALID: se elimina y se vuelve a crear
+        cr.execute("""
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+             WHERE i.indrelid = %s::regclass AND c.relname IN %s AND NOT i.indisvalid
+        """, (self._table, tuple(INDICES)))
+        for (nombre,) in cr.fetchall():
+            _logger.warning("⚠️ Índice %s inválido (creación concurrente interrumpida): se reconstruye", nombre)
+            cr.execute(f'DROP INDEX IF EXISTS "{nombre}"')
+        cr.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (self._table,))
+        existentes = {row[0] for row in cr.fetchall()}
+        faltantes = [nombre for nombre in INDICES if nombre not in existentes]
+        if not faltantes:
+            return
+        if relkind != 'p' and filas > MAX_FILAS_INDICE_SINCRONO:
+            _logger.warning(
+                "⚠️ Faltan índices en %s (%s); con ~%d filas se crean con crear_indices_concurrentes()",
+                self._table, ", ".join(faltantes), filas)
+            return
+        for nombre in faltantes:
+            cr.execute(f'CREATE INDEX IF NOT EXISTS "{nombre}" ON {self._table} {INDICES[nombre]}')
+
+    @api.model
+    def _es_particionada(self):
+        self.env.cr.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", (self._table,))
+        return self.env.cr.fetchone()[0] == 'p'
+
+    def _nombre_particion(self, mes):
+        return f"{self._table}_p{mes:%Y%m}"
+
+    @api.model
+    def _asegurar_particiones(self, desde=None):
+        """Crea las particiones mensuales desde ``desde`` (o el mes en curso) hasta unos meses por delante."""
+        if not self._es_particionada():
+            return
+        mes = (desde or fields.Datetime.now()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        hasta = fields.Datetime.now().replace(day=1) + relativedelta(months=MESES_PARTICION_ADELANTO)
+        while mes <= hasta:
+            siguiente = mes + relativedelta(months=1)
+            try:
+                with self.env.cr.savepoint():
+                    self.env.cr.execute(f"""
+                        CREATE TABLE IF NOT EXISTS "{self._nombre_particion(mes)}"
+                        PARTITION OF {self._table} FOR VALUES FROM (%s) TO (%s)
+                    """, (mes, siguiente))
+            except Exception as e:
+                # Suele ser que la partición por defecto ya tiene filas de ese mes
+                _logger.warning("⚠️ No se pudo crear la partición de %s: %s", f"{mes:%Y-%m}", e)
+            mes = siguiente
+
+    @api.model
+    def _convertir_a_particionada(self):
+        """Convierte la tabla de resultados en una tabla particionada por mes de create_date.
+
+        Copia las filas existentes, conserva secuencia, restricciones e índices y deja una partición
+        por defecto para fechas fuera de rango. Bloquea la tabla durante toda la copia: es un paso
+        fuera de línea que se lanza desde ``odoo-bin shell`` (ver static/description/index.html),
+        nunca desde una petición web o un cron.
+        """
+        cr = self.env.cr
+        tabla = self._table
+        legado = f"{tabla}_legacy"
+        if self._es_particionada():
+            return
+        self.flush_model()
+        cr.execute(f"LOCK TABLE {tabla} IN ACCESS EXCLUSIVE MODE")
+        cr.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname != %s",
+                   (tabla, f"{tabla}_pkey"))
+        indices = cr.fetchall()
+        cr.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype IN ('f', 'c')
+        """, (tabla,))
+        restricciones = cr.fetchall()
+        cr.execute(f"SELECT min(create_date) FROM {tabla}")
+        desde = cr.fetchone()[0]
+
+        cr.execute(f"ALTER TABLE {tabla} RENAME TO {legado}")
+        cr.execute(f"ALTER TABLE {legado} RENAME CONSTRAINT {tabla}_pkey TO {legado}_pkey")
+        for nombre, _definicion in restricciones:
+            cr.execute(f'ALTER TABLE {legado} DROP CONSTRAINT "{nombre}"')
+        for nombre, _definicion in indices:
+            cr.execute(f'DROP INDEX "{nombre}"')
+        cr.execute(f"ALTER SEQUENCE {tabla}_id_seq OWNED BY NONE")
+        cr.execute(f"UPDATE {legado} SET create_date = COALESCE(write_date, now() AT TIME ZONE 'UTC') "
+                   f"WHERE create_date IS NULL")
+
+        # La clave de partición debe formar parte de la clave primaria
+        cr.execute(f"CREATE TABLE {tabla} (LIKE {legado} INCLUDING DEFAULTS) PARTITION BY RANGE (create_date)")
+        cr.execute(f"ALTER TABLE {tabla} ALTER COLUMN create_date SET NOT NULL")
+        cr.execute(f"ALTER TABLE {tabla} ADD CONSTRAINT {tabla}_pkey PRIMARY KEY (id, create_date)")
+        cr.execute(f"ALTER SEQUENCE {tabla}_id_seq OWNED BY {tabla}.id")
+        cr.execute(f"CREATE TABLE {tabla}_pdefault PARTITION OF {tabla} DEFAULT")
+        self._asegurar_particiones(desde)
+
+        cr.execute(f"INSERT INTO {tabla} SELECT * FROM {legado}")
+        for nombre, definicion in restricciones:
+            cr.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT "{nombre}" {definicion}')
+        for _nombre, definicion in indices:
+            cr.execute(definicion)
+        cr.execute(f"DROP TABLE {legado}")
+        self.init()
+        cr.execute(f"ANALYZE {tabla}")
+        _logger.info("🗂️ %s convertida a tabla particionada por mes", tabla)
+
+    @api.model
+    def _eliminar_particiones_vencidas(self, limite):
+        """Resume y elimina de golpe las particiones mensuales que terminan antes de ``limite``."""
+        self.env.cr.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent = %s::regclass
+             ORDER BY c.relname
+        """, (self._table,))
+        patron = re.compile(rf"{self._table}_p(\d{{4}})(\d{{2}})")
+        for (nombre,) in self.env.cr.fetchall():
+            coincidencia = patron.fullmatch(nombre)
+            if not coincidencia:
+                continue
+            fin = datetime(int(coincidencia.group(1)), int(coincidencia.group(2)), 1) + relativedelta(months=1)
+            if fin > limite:
+                continue
+            self.env['uhuu.api.test.result.daily']._acumular(particion=nombre)
+            self.env.cr.execute(f'DROP TABLE "{nombre}"')
+            self.env.cr.commit()
+            _logger.info("🧹 Retención: partición %s resumida y eliminada", nombre)
+
+    @api.model
+    def _accion_tendencia_latencia(self, domain, nombre):
+        return {
+            'name': nombre,
+            'type': 'ir.actions.act_window',
+            'res_model': 'uhuu.api.test.result',
+            'view_mode': 'graph,pivot,tree,form',
+            'views': [
+                (self.env.ref('rs_admin_console.view_uhuu_api_test_result_latency_graph').id, 'graph'),
+                (False, 'pivot'), (False, 'tree'), (False, 'form'),
+            ],
+            'domain': domain,
+        }
+
+    @api.model
+    def cron_retencion_resultados(self):
+        """Resume en uhuu.api.test.result.daily los resultados vencidos y los elimina por lotes.
+
+        Los exitosos y los fallidos tienen plazos de retención distintos; cada lote se resume,
+        se borra y se confirma en la misma transacción para no contar dos veces ninguna fila.
+        """
+        settings = self.env['res.config.settings'].get_api_settings()
+        ahora = fields.Datetime.now()
+        if self._es_particionada():
+            # Los meses completos fuera de ambos plazos se descartan enteros; el resto va por lotes
+            if settings['retention_days_success'] > 0 and settings['retention_days_failed'] > 0:
+                dias = max(settings['retention_days_success'], settings['retention_days_failed'])
+                self._eliminar_particiones_vencidas(fields.Datetime.subtract(ahora, days=dias))
+            self._asegurar_particiones()
+            self.env.cr.commit()
+        # Sin valor cuenta como fallido; cada condición por separado para recorrer
+        # uhuu_api_test_result_retention_idx en orden de fecha
+        politicas = [
+            ("success = true", 'exitosos', settings['retention_days_success']),
+            ("success = false", 'fallidos', settings['retention_days_failed']),
+            ("success IS NULL", 'fallidos', settings['retention_days_failed']),
+        ]
+        for condicion, etiqueta, dias in politicas:
+            if dias <= 0:
+                continue
+            limite = fields.Datetime.subtract(ahora, days=dias)
+            while True:
+                self.env.cr.execute(f"""
+                    SELECT id FROM uhuu_api_test_result
+                     WHERE {condicion} AND create_date < %s
+                     ORDER BY create_date
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                """, (limite, settings['retention_batch_size']))
+                ids = [row[0] for row in self.env.cr.fetchall()]
+                if not ids:
+                    break
+                self.env['uhuu.api.test.result.daily']._acumular(ids)
+                self.browse(ids).unlink()
+                self.env.cr.commit()
+                _logger.info("🧹 Retención: %s resultados %s resumidos y eliminados",
+                             len(ids), etiqueta)
+        if settings['retention_days_success'] > 0 and settings['retention_days_failed'] > 0:
+            # El detalle de endpoints de cada ejecución se conserva lo mismo que sus resultados
+            dias = max(settings['retention_days_success'], settings['retention_days_failed'])
+            self.env['uhuu.api.run.job.line']._purgar_vencidas(
+                fields.Datetime.subtract(ahora, days=dias), settings['retention_batch_size'])
+        if settings['job_retention_days'] > 0:
+            self.env['uhuu.api.run.job']._purgar_vencidos(
+                fields.Datetime.subtract(ahora, days=settings['job_retention_days']), settings['retention_batch_size'])
+        self.env['uhuu.api.response.blob']._purgar_huerfanos()
+
+    def accion_comentario_ia(self):
+        """Explica los resultados fallidos reutilizando la explicación de errores con la misma firma.
+
+        Las firmas sin explicación se consultan a la IA una sola vez cada una, en lotes concurrentes.
+        """
+        fallidos = self.filtered(lambda r: not r.success)
+        if not fallidos:
+            return
+        por_firma = defaultdict(lambda: self.browse())
+        muestras = {}
+        for record in fallidos:
+            texto = record.response or ""
+            clave = firma_error.firma(record.status_code, texto)
+            por_firma[clave] |= record
+            muestras.setdefault(clave, (record.status_code, texto))
+
+        Explicacion = self.env['uhuu.api.ai.explanation'].sudo()
+        comentarios = Explicacion._buscar(list(por_firma))
+        pendientes = [clave for clave in por_firma if clave not in comentarios]
+        _logger.info("🤖 Análisis IA: %s firmas distintas, %s en caché, %s por consultar",
+                     len(por_firma), len(comentarios), len(pendientes))
+
+        if pendientes:
+            ajustes = self.env['res.config.settings'].get_ai_settings()
+            for inicio in range(0, len(pendientes), ajustes['batch_size']):
+                lote = pendientes[inicio:inicio + ajustes['batch_size']]
+                respuestas = ejecutar_consultas_ia(
+                    [self._preparar_consulta_ia(ajustes, *muestras[clave]) for clave in lote],
+                    max_workers=ajustes['max_workers'])
+                nuevas = {}
+                for clave, (ok, comentario) in zip(lote, respuestas):
+                    comentarios[clave] = comentario
+                    # Los errores de la propia consulta no se guardan: se reintentan la próxima vez
+                    if ok:
+                        status_code, texto = muestras[clave]
+                        nuevas[clave] = (status_code, firma_error.normalizar(texto), comentario)
+                Explicacion._guardar(nuevas)
+
+        # Una escritura por firma en lugar de una por resultado
+        for clave, records in por_firma.items():
+            records.with_context(**CONTEXTO_LOTE).write({'comentario_ia': comentarios[clave]})
+
+    @api.model
+    def _preparar_consulta_ia(self, ajustes, status_code, response_text):
+        # Se prepara en el hilo principal; el envío no accede al ORM
+        if not ajustes['api_key'] and ajustes['provider_url'] == PROVEEDOR_IA_DEFAULT:
+            return {'error': "No se configuró la clave API de OpenAI."}
+        prompt = (
+            f"Estoy probando una API que se conectar a odoo version 17 comunity y obtengo un error {status_code} con este cuerpo de respuesta: "
+            f"{response_text[:firma_error.MAX_CARACTERES]}. ¿Cuál puede ser la causa probable y cómo lo corrijo?"
+        )
+        headers = {'Content-Type': 'application/json'}
+        if ajustes['api_key']:
+            headers['Authorization'] = f"Bearer {ajustes['api_key']}"
+        return {
+            'session': self.env['res.config.settings']._get_http_session(ajustes['provider_url']),
+            'url': ajustes['provider_url'],
+            'headers': headers,
+            'json': {
+                "model": ajustes['model'],
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ]
+            },
+            'timeout': ajustes['timeout'],
+        }
+
+    def obtener_explicacion_ia(self, status_code, response_text):
+        ajustes = self.env['res.config.settings'].get_ai_settings()
+        return _consultar_ia(self._preparar_consulta_ia(ajustes, status_code, response_text))[1]
+
+    # @api.model
+    # def create(self, vals):
+    #     endpoint = self.env['uhuu.api.endpoint'].browse(vals.get('endpoint_id'))
+    #     if endpoint:
+    #         # Copia partner según si es login o no
+    #         if endpoint.type_login:
+    #             vals['partner_id'] = endpoint.partner_id.id
+    #         elif endpoint.endpoint_id_padre:
+    #             vals['partner_id'] = endpoint.endpoint_id_padre.partner_id.id
+    #
+    #         # Copia el estado del endpoint al resultado
+    #         vals['state'] = endpoint.state or 'test_failed'
+    #
+    #     return super(UhuuApiTestResult, self).create(vals)
+
+
+def _consultar_ia(consulta):
+    """Envía una consulta preparada y devuelve ``(ok, comentario)``. Sin acceso al ORM."""
+    if 'error' in consulta:
+        return False, consulta['error']
+    consulta = dict(consulta)
+    session = consulta.pop('session', None) or requests
+    try:
+        res = session.post(**consulta)
+        result = res.json()
+        contenido = result.get("choices", [{}])[0].get("message", {}).get("content")
+        if res.status_code >= 400 or not contenido:
+            return False, contenido or f"Sin respuesta de IA ({res.status_code})"
+        return True, contenido
+    except Exception as e:
+        return False, f"Error al consultar la IA: {str(e)}"
+
+
+def ejecutar_consultas_ia(consultas, max_workers=1):
+    """Resuelve las consultas en paralelo (como máximo ``max_workers``) y devuelve sus resultados en orden."""
+    if max_workers <= 1 or len(consultas) <= 1:
+        return [_consultar_ia(consulta) for consulta in consultas]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(consultas))) as executor:
+        return list(executor.map(_consultar_ia, consultas))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+
+
+# Tasas que se recalculan al agrupar a partir de sus sumas: la media de los porcentajes de cada fila
+# daría el mismo peso a una hora con 1 prueba que a una con 10.000
+TASAS_PONDERADAS = {
+    'pass_rate': ('success_count', 'total_count', 100.0),
+    'duration_avg': ('duration_sum', 'duration_count', 1.0),
+}
+
+
+def leer_grupos_ponderados(read_group, domain, fields, groupby, **kwargs):
+    """Llama a ``read_group`` pidiendo también las sumas y recalcula las tasas de cada grupo."""
+    nombres = {spec.split(':')[0] for spec in fields}
+    tasas = [tasa for tasa in TASAS_PONDERADAS if tasa in nombres]
+    extra = [f"{campo}:sum" for tasa in tasas for campo in TASAS_PONDERADAS[tasa][:2] if campo not in nombres]
+    grupos = read_group(domain, list(fields) + extra, groupby, **kwargs)
+    for grupo in grupos:
+        for tasa in tasas:
+            numerador, denominador, factor = TASAS_PONDERADAS[tasa]
+            total = grupo.get(denominador)
+            grupo[tasa] = factor * (grupo.get(numerador) or 0.0) / total if total else 0.0
+    return grupos
+
+
+class UhuuApiTestResultDaily(models.Model):
+    _name = 'uhuu.api.test.result.daily'
+    _description = 'Resumen diario de pruebas de endpoint Uhuu'
+    _order = 'date desc, partner_id, endpoint_id'
+
+    date = fields.Date(string='Día', required=True, index=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Cliente asociado', readonly=True, index=True)
+    endpoint_id = fields.Many2one('uhuu.api.endpoint', required=True, readonly=True, ondelete='cascade')
+    environment_id = fields.Many2one('uhuu.api.environment', required=True, readonly=True, ondelete='cascade')
+    total_count = fields.Integer(string='Pruebas', readonly=True)
+    success_count = fields.Integer(string='Exitosas', readonly=True)
+    failed_count = fields.Integer(string='Fallidas', readonly=True)
+    pass_rate = fields.Float(string='% Éxito', readonly=True, group_operator='avg',
+                             help="Al agrupar se calcula sobre el total de pruebas del grupo")
+    duration_count = fields.Integer(string='Pruebas con duración', readonly=True)
+    duration_sum = fields.Float(string='Duración total (s)', readonly=True)
+    duration_avg = fields.Float(string='Duración media (s)', readonly=True, group_operator='avg', digits=(16, 3))
+    duration_min = fields.Float(string='Duración mínima (s)', readonly=True, group_operator='min', digits=(16, 3))
+    duration_max = fields.Float(string='Duración máxima (s)', readonly=True, group_operator='max', digits=(16, 3))
+    first_failure_at = fields.Datetime(string='Primer fallo', readonly=True, group_operator='min')
+    last_failure_at = fields.Datetime(string='Último fallo', readonly=True, group_operator='max')
+
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
+        return leer_grupos_ponderados(
+            super().read_group, domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy)
+
+    def init(self):
+        # Índice único sobre la clave del resumen (partner puede ser nulo) para el upsert de _acumular
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uhuu_api_test_result_daily_key_uniq
+            ON uhuu_api_test_result_daily (date, COALESCE(partner_id, 0), endpoint_id, environment_id)
+        """)
+
+    @api.model
+    def _acumular(self, result_ids=None, particion=None):
+        """Suma los resultados crudos indicados a sus filas diarias (creándolas si no existen).
+
+        Con ``particion`` se resume completa esa partición mensual de uhuu_api_test_result.
+        """
+        if not result_ids and not particion:
+            return
+        self.env['uhuu.api.test.result'].flush_model()
+        if particion:
+            origen, params = f'"{particion}" r', {'uid': self.env.uid}
+        else:
+            origen, params = "uhuu_api_test_result r WHERE r.id IN %(ids)s", {'ids': tuple(result_ids), 'uid': self.env.uid}
+        self.env.cr.execute(f"""
+            INSERT INTO uhuu_api_test_result_daily AS d (
+                date, partner_id, endpoint_id, environment_id,
+                total_count, success_count, failed_count, pass_rate,
+                duration_count, duration_sum, duration_avg, duration_min, duration_max,
+                first_failure_at, last_failure_at,
+                create_uid, create_date, write_uid, write_date)
+            SELECT COALESCE(r.tested_at, r.create_date)::date, r.partner_id, r.endpoint_id, r.environment_id,
+                   count(*),
+                   count(*) FILTER (WHERE r.success),
+                   count(*) FILTER (WHERE r.success IS NOT TRUE),
+                   100.0 * count(*) FILTER (WHERE r.success) / count(*),
+                   count(r.duration), COALESCE(sum(r.duration), 0), avg(r.duration), min(r.duration), max(r.duration),
+                   min(COALESCE(r.tested_at, r.create_date)) FILTER (WHERE r.success IS NOT TRUE),
+                   max(COALESCE(r.tested_at, r.create_date)) FILTER (WHERE r.success IS NOT TRUE),
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM {origen}
+          GROUP BY 1, 2, 3, 4
+            ON CONFLICT (date, COALESCE(partner_id, 0), endpoint_id, environment_id) DO UPDATE SET
+                total_count = d.total_count + EXCLUDED.total_count,
+                success_count = d.success_count + EXCLUDED.success_count,
+                failed_count = d.failed_count + EXCLUDED.failed_count,
+                pass_rate = 100.0 * (d.success_count + EXCLUDED.success_count)
+                            / (d.total_count + EXCLUDED.total_count),
+                duration_count = d.duration_count + EXCLUDED.duration_count,
+                duration_sum = d.duration_sum + EXCLUDED.duration_sum,
+                duration_avg = (d.duration_sum + EXCLUDED.duration_sum)
+                               / NULLIF(d.duration_count + EXCLUDED.duration_count, 0),
+                duration_min = LEAST(d.duration_min, EXCLUDED.duration_min),
+                duration_max = GREATEST(d.duration_max, EXCLUDED.duration_max),
+                first_failure_at = LEAST(d.first_failure_at, EXCLUDED.first_failure_at),
+                last_failure_at = GREATEST(d.last_failure_at, EXCLUDED.last_failure_at),
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, params)
+        self.invalidate_model()
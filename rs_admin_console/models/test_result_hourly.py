@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models, api
+
+from .test_result_daily import leer_grupos_ponderados
+
+
+class UhuuApiTestResultHourly(models.Model):
+    _name = 'uhuu.api.test.result.hourly'
+    _description = 'Resumen por hora de pruebas de endpoint Uhuu'
+    _order = 'hour desc, partner_id, endpoint_id'
+
+    hour = fields.Datetime(string='Hora', required=True, index=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Cliente asociado', readonly=True, index=True)
+    endpoint_id = fields.Many2one('uhuu.api.endpoint', required=True, readonly=True, ondelete='cascade')
+    environment_id = fields.Many2one('uhuu.api.environment', required=True, readonly=True, ondelete='cascade')
+    total_count = fields.Integer(string='Pruebas', readonly=True)
+    success_count = fields.Integer(string='Exitosas', readonly=True)
+    failed_count = fields.Integer(string='Fallidas', readonly=True)
+    pass_rate = fields.Float(string='% Éxito', readonly=True, group_operator='avg',
+                             help="Al agrupar se calcula sobre el total de pruebas del grupo")
+    duration_count = fields.Integer(string='Pruebas con duración', readonly=True)
+    duration_sum = fields.Float(string='Duración total (s)', readonly=True)
+    duration_avg = fields.Float(string='Duración media (s)', readonly=True, group_operator='avg', digits=(16, 3))
+    duration_min = fields.Float(string='Duración mínima (s)', readonly=True, group_operator='min', digits=(16, 3))
+    duration_max = fields.Float(string='Duración máxima (s)', readonly=True, group_operator='max', digits=(16, 3))
+
+    @api.model
+    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
+        return leer_grupos_ponderados(
+            super().read_group, domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy)
+
+    def init(self):
+        # Índice único sobre la clave del resumen (partner puede ser nulo) para el upsert de _acumular
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uhuu_api_test_result_hourly_key_uniq
+            ON uhuu_api_test_result_hourly (hour, COALESCE(partner_id, 0), endpoint_id, environment_id)
+        """)
+
+    @api.model
+    def _acumular(self, result_ids):
+        """Suma los resultados recién registrados a sus filas por hora (creándolas si no existen).
+
+        Se llama al registrar cada lote, así los tableros leen filas ya agregadas y su coste
+        no depende del histórico crudo que se conserve.
+        """
+        if not result_ids:
+            return
+        self.env['uhuu.api.test.result'].flush_model()
+        # Las filas se insertan en el orden de la clave para que dos lotes simultáneos no se bloqueen
+        self.env.cr.execute("""
+            INSERT INTO uhuu_api_test_result_hourly AS h (
+                hour, partner_id, endpoint_id, environment_id,
+                total_count, success_count, failed_count, pass_rate,
+                duration_count, duration_sum, duration_avg, duration_min, duration_max,
+                create_uid, create_date, write_uid, write_date)
+            SELECT date_trunc('hour', COALESCE(r.tested_at, r.create_date)), r.partner_id, r.endpoint_id, r.environment_id,
+                   count(*),
+                   count(*) FILTER (WHERE r.success),
+                   count(*) FILTER (WHERE r.success IS NOT TRUE),
+                   100.0 * count(*) FILTER (WHERE r.success) / count(*),
+                   count(r.duration), COALESCE(sum(r.duration), 0), avg(r.duration), min(r.duration), max(r.duration),
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM uhuu_api_test_result r
+             WHERE r.id IN %(ids)s
+          GROUP BY 1, 2, 3, 4
+          ORDER BY 1, COALESCE(r.partner_id, 0), 3, 4
+            ON CONFLICT (hour, COALESCE(partner_id, 0), endpoint_id, environment_id) DO UPDATE SET
+                total_count = h.total_count + EXCLUDED.total_count,
+                success_count = h.success_count + EXCLUDED.success_count,
+                failed_count = h.failed_count + EXCLUDED.failed_count,
+                pass_rate = 100.0 * (h.success_count + EXCLUDED.success_count)
+                            / (h.total_count + EXCLUDED.total_count),
+                duration_count = h.duration_count + EXCLUDED.duration_count,
+                duration_sum = h.duration_sum + EXCLUDED.duration_sum,
+                duration_avg = (h.duration_sum + EXCLUDED.duration_sum)
+                               / NULLIF(h.duration_count + EXCLUDED.duration_count, 0),
+                duration_min = LEAST(h.duration_min, EXCLUDED.duration_min),
+                duration_max = GREATEST(h.duration_max, EXCLUDED.duration_max),
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, {'ids': tuple(result_ids), 'uid': self.env.uid})
+        self.invalidate_model()
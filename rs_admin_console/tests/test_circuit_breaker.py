@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+import requests
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.api_end_point import _enviar_llamada
+from ..tools import circuit_breaker
+
+CLAVE = ('test_db', 'entorno_prueba')
+UMBRAL = 3
+COOLDOWN = 60
+
+
+@tagged('post_install', '-at_install')
+class TestCircuitBreaker(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        circuit_breaker.reiniciar(CLAVE)
+        self.addCleanup(circuit_breaker.reiniciar, CLAVE)
+        self.ahora = 1000.0
+        reloj = patch.object(circuit_breaker.time, 'time', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def _abrir(self):
+        for _i in range(UMBRAL):
+            circuit_breaker.registrar_fallo(CLAVE, UMBRAL, COOLDOWN)
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.ABIERTO)
+
+    def test_abre_al_llegar_al_umbral(self):
+        circuit_breaker.registrar_fallo(CLAVE, UMBRAL, COOLDOWN)
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+        self._abrir()
+        self.assertFalse(circuit_breaker.permitir(CLAVE))
+
+    def test_semiabierto_deja_pasar_una_sola_prueba(self):
+        self._abrir()
+        self.ahora += COOLDOWN + 1
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.SEMIABIERTO)
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+        self.assertFalse(circuit_breaker.permitir(CLAVE))
+
+    def test_prueba_correcta_cierra(self):
+        self._abrir()
+        self.ahora += COOLDOWN + 1
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+        circuit_breaker.registrar_exito(CLAVE)
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.CERRADO)
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+
+    def test_prueba_fallida_reabre_otro_periodo(self):
+        self._abrir()
+        self.ahora += COOLDOWN + 1
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+        circuit_breaker.registrar_fallo(CLAVE, UMBRAL, COOLDOWN)
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.ABIERTO)
+        self.ahora += COOLDOWN + 1
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+
+    def test_prueba_con_otro_error_no_bloquea_el_circuito(self):
+        # Un error que no es de conexión (p. ej. cuerpo chunked cortado) debe liberar la prueba
+        self._abrir()
+        self.ahora += COOLDOWN + 1
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+        circuit_breaker.cancelar_sonda(CLAVE, UMBRAL, COOLDOWN)
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.ABIERTO)
+        self.ahora += COOLDOWN + 1
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+        circuit_breaker.registrar_exito(CLAVE)
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
+
+    def test_cancelar_sin_prueba_no_cuenta_fallo(self):
+        circuit_breaker.cancelar_sonda(CLAVE, 1, COOLDOWN)
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.CERRADO)
+
+
+class _SesionRota:
+    """Sesión que falla al leer la respuesta como un cuerpo chunked cortado."""
+
+    def request(self, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead")
+
+
+@tagged('post_install', '-at_install')
+class TestCircuitoEnLlamadas(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        circuit_breaker.reiniciar(CLAVE)
+        self.addCleanup(circuit_breaker.reiniciar, CLAVE)
+        self.ahora = 1000.0
+        reloj = patch.object(circuit_breaker.time, 'time', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def _llamada_rota(self):
+        return _enviar_llamada({
+            'method': 'GET',
+            'url': 'http://api.invalid/ping',
+            'session': _SesionRota(),
+            'circuito': (CLAVE, UMBRAL, COOLDOWN),
+        })
+
+    def test_error_no_de_conexion_no_suma_fallos(self):
+        for _i in range(UMBRAL + 1):
+            self.assertFalse(self._llamada_rota()['success'])
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.CERRADO)
+
+    def test_error_no_de_conexion_en_la_prueba_reabre(self):
+        for _i in range(UMBRAL):
+            circuit_breaker.registrar_fallo(CLAVE, UMBRAL, COOLDOWN)
+        self.ahora += COOLDOWN + 1
+        resultado = self._llamada_rota()
+        self.assertIn('ChunkedEncodingError', resultado['response'])
+        self.assertEqual(circuit_breaker.estado(CLAVE), circuit_breaker.ABIERTO)
+        self.ahora += COOLDOWN + 1
+        self.assertTrue(circuit_breaker.permitir(CLAVE))
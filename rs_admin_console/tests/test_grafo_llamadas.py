@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import threading
+from unittest.mock import patch
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models import api_end_point
+from ..models.api_end_point import ejecutar_grafo_llamadas
+
+
+def _peticion(nodo):
+    return {'method': 'GET', 'url': f'http://api.invalid/{nodo}', 'headers': {}, 'nodo': nodo}
+
+
+@tagged('post_install', '-at_install')
+class TestGrafoLlamadas(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enviadas = []
+        self.fallan = set()
+        self._lock = threading.Lock()
+        envio = patch.object(api_end_point, '_enviar_antes_de', side_effect=self._enviar)
+        envio.start()
+        self.addCleanup(envio.stop)
+
+    def _enviar(self, peticion, deadline=None, timeout=15):
+        with self._lock:
+            self.enviadas.append(peticion['nodo'])
+        exito = peticion['nodo'] not in self.fallan
+        return {
+            'status_code': 200 if exito else 500,
+            'success': exito,
+            'response': peticion['headers'].get('Authorization', ''),
+        }
+
+    def _ejecutar(self, padres):
+        return ejecutar_grafo_llamadas(
+            {nodo: _peticion(nodo) for nodo in padres}, padres,
+            lambda nodo, resultado: f"tok-{nodo}")
+
+    def test_cadena_lineal_en_orden_con_el_token_del_padre(self):
+        resultados = self._ejecutar({'login': None, 'perfil': 'login', 'pedido': 'perfil'})
+        self.assertEqual(self.enviadas, ['login', 'perfil', 'pedido'])
+        self.assertTrue(all(r['success'] for r in resultados.values()))
+        self.assertEqual(resultados['login']['response'], '')
+        self.assertEqual(resultados['perfil']['response'], 'Bearer tok-login')
+        self.assertEqual(resultados['pedido']['response'], 'Bearer tok-perfil')
+
+    def test_fallo_del_padre_bloquea_su_subarbol(self):
+        self.fallan.add('login')
+        resultados = self._ejecutar({
+            'login': None, 'perfil': 'login', 'pedido': 'perfil', 'salud': None,
+        })
+        self.assertCountEqual(self.enviadas, ['login', 'salud'])
+        self.assertFalse(resultados['login']['success'])
+        self.assertTrue(resultados['salud']['success'])
+        for nodo in ('perfil', 'pedido'):
+            self.assertFalse(resultados[nodo]['success'])
+            self.assertEqual(resultados[nodo]['blocked_by'], 'login')
+
+    def test_ciclo_no_se_envia(self):
+        resultados = self._ejecutar({'a': 'b', 'b': 'a', 'salud': None})
+        self.assertEqual(self.enviadas, ['salud'])
+        self.assertTrue(resultados['salud']['success'])
+        for nodo in ('a', 'b'):
+            self.assertFalse(resultados[nodo]['success'])
+            self.assertNotIn('blocked_by', resultados[nodo])
+            self.assertIn('Dependencia circular', resultados[nodo]['response'])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Circuit breaker por proceso para entornos o hosts remotos.
+
+Tras ``umbral`` fallos de conexión consecutivos el circuito se abre y las llamadas fallan al
+momento sin tocar la red. Pasado ``cooldown`` queda semiabierto: se deja pasar una sola llamada
+de prueba; si responde se cierra y si vuelve a fallar se abre otro periodo completo.
+"""
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+CERRADO = 'closed'
+ABIERTO = 'open'
+SEMIABIERTO = 'half_open'
+
+_lock = threading.Lock()
+_circuitos = {}  # clave -> {'fallos': int, 'abierto_hasta': epoch, 'sondeando': bool}
+
+
+def permitir(clave):
+    """True si la llamada puede enviarse; en semiabierto solo lo es para la primera que llega."""
+    with _lock:
+        circuito = _circuitos.get(clave)
+        if not circuito or not circuito['abierto_hasta']:
+            return True
+        if time.time() < circuito['abierto_hasta'] or circuito['sondeando']:
+            return False
+        circuito['sondeando'] = True
+        return True
+
+
+def registrar_exito(clave):
+    with _lock:
+        circuito = _circuitos.pop(clave, None)
+    if circuito and circuito['abierto_hasta']:
+        _logger.info("🟢 Circuito cerrado para %s", clave)
+
+
+def registrar_fallo(clave, umbral, cooldown):
+    """Suma un fallo de conexión y abre el circuito al llegar al umbral (o si falla la prueba)."""
+    with _lock:
+        circuito = _circuitos.setdefault(clave, {'fallos': 0, 'abierto_hasta': 0.0, 'sondeando': False})
+        circuito['fallos'] += 1
+        if circuito['sondeando'] or circuito['fallos'] >= umbral:
+            circuito['abierto_hasta'] = time.time() + cooldown
+            circuito['sondeando'] = False
+            _logger.warning("🔴 Circuito abierto para %s durante %ss tras %s fallos de conexión",
+                            clave, cooldown, circuito['fallos'])
+        return circuito['fallos']
+
+
+def cancelar_sonda(clave, umbral, cooldown):
+    """Cuenta como fallo la llamada de prueba que terminó con un error que no es de conexión.
+
+    Sin esto ``sondeando`` quedaría activo y el circuito no volvería a dejar pasar ninguna llamada.
+    """
+    with _lock:
+        circuito = _circuitos.get(clave)
+        sondeando = bool(circuito and circuito['sondeando'])
+    if sondeando:
+        registrar_fallo(clave, umbral, cooldown)
+
+
+def estado(clave):
+    with _lock:
+        circuito = _circuitos.get(clave)
+        if not circuito or not circuito['abierto_hasta']:
+            return CERRADO
+        if time.time() < circuito['abierto_hasta']:
+            return ABIERTO
+        return SEMIABIERTO
+
+
+def reiniciar(clave):
+    with _lock:
+        _circuitos.pop(clave, None)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Firma normalizada de un error de API para reutilizar su explicación.
+
+Dos fallos con el mismo código y el mismo cuerpo salvo identificadores, fechas, tokens o números
+producen la misma firma.
+"""
+import hashlib
+import re
+
+# Solo se normaliza el inicio del cuerpo: basta para distinguir errores y acota el coste
+MAX_CARACTERES = 4000
+
+# El orden importa: los patrones más específicos antes que los números sueltos
+PATRONES = [
+    (re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.I), '<uuid>'),
+    (re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?'), '<fecha>'),
+    (re.compile(r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4}'), '<fecha>'),
+    (re.compile(r'\d{2}:\d{2}:\d{2}(\.\d+)?'), '<hora>'),
+    (re.compile(r'eyJ[\w-]+\.[\w-]+\.[\w-]*'), '<jwt>'),
+    (re.compile(r'\b[0-9a-f]{16,}\b', re.I), '<hex>'),
+    (re.compile(r'\d+(\.\d+)?'), '<n>'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalizar(texto):
+    texto = (texto or '')[:MAX_CARACTERES]
+    for patron, reemplazo in PATRONES:
+        texto = patron.sub(reemplazo, texto)
+    return texto.strip()
+
+
+def firma(status_code, texto):
+    """SHA-256 de ``status_code`` y el cuerpo normalizado."""
+    return hashlib.sha256(f"{status_code or 0}|{normalizar(texto)}".encode('utf-8')).hexdigest()
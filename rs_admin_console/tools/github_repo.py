@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Lectura de los manifiestos de un repositorio GitHub con el mínimo de peticiones.
+
+Un único ``git/trees?recursive=1`` (condicional con ETag) da el SHA de cada ``__manifest__.py``;
+solo los blobs no vistos antes se descargan, uno a uno si son pocos o con un único tarball
+si son muchos. Los manifiestos ya interpretados se cachean por SHA de blob en el proceso.
+"""
+import ast
+import base64
+import logging
+import tarfile
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+API_URL = "https://api.github.com"
+MANIFEST = '__manifest__.py'
+UMBRAL_TARBALL = 15
+MAX_MANIFIESTOS_CACHE = 5000
+
+_lock = threading.Lock()
+_arboles = {}  # (repo, branch) -> (etag, {modulo: blob_sha})
+_manifiestos = {}  # blob_sha -> dict del manifiesto
+
+
+class GithubError(Exception):
+    pass
+
+
+def _interpretar(contenido):
+    return ast.literal_eval(contenido.decode('utf-8') if isinstance(contenido, bytes) else contenido)
+
+
+def listar_manifiestos(session, repo, branch, headers, timeout=30):
+    """Devuelve ``{directorio_modulo: blob_sha}`` de los manifiestos de primer nivel del repo."""
+    url = f"{API_URL}/repos/{repo}/git/trees/{branch}"
+    with _lock:
+        etag, modulos = _arboles.get((repo, branch), (None, None))
+    cabeceras = dict(headers)
+    if etag and modulos is not None:
+        cabeceras['If-None-Match'] = etag
+    response = session.get(url, params={'recursive': 1}, headers=cabeceras, timeout=timeout)
+    if response.status_code == 304:
+        return dict(modulos)
+    if response.status_code != 200:
+        raise GithubError(f"Error {response.status_code} al leer el árbol del repositorio: {response.text}")
+
+    data = response.json()
+    if data.get('truncated'):
+        _logger.warning("⚠️ El árbol de %s@%s viene truncado; pueden faltar módulos", repo, branch)
+    modulos = {}
+    for item in data.get('tree', []):
+        partes = item.get('path', '').split('/')
+        if item.get('type') == 'blob' and len(partes) == 2 and partes[1] == MANIFEST:
+            modulos[partes[0]] = item['sha']
+    with _lock:
+        _arboles[(repo, branch)] = (response.headers.get('ETag'), modulos)
+    return dict(modulos)
+
+
+def _desde_blobs(session, repo, headers, faltantes, timeout):
+    leidos = {}
+    for modulo, sha in faltantes.items():
+        response = session.get(f"{API_URL}/repos/{repo}/git/blobs/{sha}", headers=headers, timeout=timeout)
+        if response.status_code != 200:
+            leidos[modulo] = GithubError(f"Error {response.status_code} al leer {modulo}/{MANIFEST}")
+            continue
+        try:
+            leidos[modulo] = _interpretar(base64.b64decode(response.json().get('content') or ''))
+        except Exception as e:
+            leidos[modulo] = e
+    return leidos
+
+
+def _desde_tarball(session, repo, branch, headers, faltantes, timeout):
+    leidos = {}
+    response = session.get(f"{API_URL}/repos/{repo}/tarball/{branch}", headers=headers,
+                           timeout=timeout, stream=True)
+    try:
+        if response.status_code != 200:
+            raise GithubError(f"Error {response.status_code} al descargar el repositorio")
+        with tarfile.open(fileobj=response.raw, mode='r|gz') as tar:
+            for miembro in tar:
+                # Las rutas vienen como '<owner>-<repo>-<sha>/<modulo>/__manifest__.py'
+                partes = miembro.name.split('/')
+                if len(partes) != 3 or partes[2] != MANIFEST or partes[1] not in faltantes:
+                    continue
+                try:
+                    leidos[partes[1]] = _interpretar(tar.extractfile(miembro).read())
+                except Exception as e:
+                    leidos[partes[1]] = e
+    finally:
+        response.close()
+    for modulo in faltantes:
+        leidos.setdefault(modulo, GithubError(f"{modulo}/{MANIFEST} no está en el tarball"))
+    return leidos
+
+
+def leer_manifiestos(session, repo, branch, headers, blobs, timeout=30):
+    """Devuelve ``{modulo: dict | Exception}`` para los ``{modulo: blob_sha}`` pedidos."""
+    resultado = {}
+    faltantes = {}
+    with _lock:
+        for modulo, sha in blobs.items():
+            if sha in _manifiestos:
+                resultado[modulo] = _manifiestos[sha]
+            else:
+                faltantes[modulo] = sha
+    if not faltantes:
+        return resultado
+
+    if len(faltantes) > UMBRAL_TARBALL:
+        leidos = _desde_tarball(session, repo, branch, headers, faltantes, timeout)
+    else:
+        leidos = _desde_blobs(session, repo, headers, faltantes, timeout)
+
+    with _lock:
+        if len(_manifiestos) > MAX_MANIFIESTOS_CACHE:
+            _manifiestos.clear()
+        for modulo, manifiesto in leidos.items():
+            if isinstance(manifiesto, dict):
+                _manifiestos[faltantes[modulo]] = manifiesto
+    resultado.update(leidos)
+    return resultado
+
+
+_shas = {}  # (repo, branch) -> (etag, sha, consultado_en)
+
+
+def obtener_sha_rama(session, repo, branch, headers, ttl=60, timeout=10):
+    """SHA del último commit de ``branch``; se sirve de caché durante ``ttl`` segundos y se revalida con ETag."""
+    clave = (repo, branch)
+    with _lock:
+        etag, sha, consultado_en = _shas.get(clave, (None, None, 0))
+    if sha and time.time() - consultado_en < ttl:
+        return sha
+
+    cabeceras = dict(headers)
+    if etag and sha:
+        cabeceras['If-None-Match'] = etag
+    response = session.get(f"{API_URL}/repos/{repo}/commits/{branch}", headers=cabeceras, timeout=timeout)
+    if response.status_code == 304:
+        nuevo_sha, nuevo_etag = sha, etag
+    elif response.status_code == 200:
+        nuevo_sha, nuevo_etag = response.json().get('sha'), response.headers.get('ETag')
+    else:
+        raise GithubError(f"Error al consultar GitHub: {response.status_code} - {response.text}")
+    with _lock:
+        _shas[clave] = (nuevo_etag, nuevo_sha, time.time())
+    return nuevo_sha
+
+
+def invalidar_sha(repo=None, branch=None):
+    with _lock:
+        for clave in list(_shas):
+            if (repo is None or clave[0] == repo) and (branch is None or clave[1] == branch):
+                del _shas[clave]
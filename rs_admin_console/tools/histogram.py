@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Histograma compacto de latencias con cubetas geométricas y decaimiento exponencial.
+
+Se guarda como una lista de conteos (una posición por cubeta); el decaimiento hace que las
+muestras antiguas pesen cada vez menos, así los percentiles reflejan la latencia reciente.
+"""
+import bisect
+
+# Límites superiores en segundos: de 5 ms a ~2 min creciendo un 25% por cubeta
+LIMITES = []
+_limite = 0.005
+while _limite < 120:
+    LIMITES.append(round(_limite, 6))
+    _limite *= 1.25
+LIMITES.append(float('inf'))
+
+
+def vacio():
+    return [0.0] * len(LIMITES)
+
+
+def normalizar(conteos):
+    # Histogramas guardados con otro número de cubetas se reinician
+    if not isinstance(conteos, list) or len(conteos) != len(LIMITES):
+        return vacio()
+    return [float(c) for c in conteos]
+
+
+def agregar(conteos, valores, decay=1.0):
+    conteos = normalizar(conteos)
+    if decay < 1.0:
+        factor = decay ** len(valores)
+        conteos = [c * factor for c in conteos]
+    for valor in valores:
+        conteos[bisect.bisect_left(LIMITES, valor)] += 1
+    return conteos
+
+
+def percentil(conteos, p):
+    """Percentil ``p`` (0-100) estimado como el límite superior de la cubeta que lo contiene."""
+    total = sum(conteos)
+    if not total:
+        return 0.0
+    objetivo = total * p / 100.0
+    acumulado = 0.0
+    for indice, conteo in enumerate(conteos):
+        acumulado += conteo
+        if acumulado >= objetivo and conteo:
+            limite = LIMITES[indice]
+            return limite if limite != float('inf') else LIMITES[-2]
+    return LIMITES[-2]
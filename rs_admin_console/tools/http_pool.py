@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Pool de sesiones HTTP keep-alive compartidas por proceso.
+
+Cada sesión se identifica con una clave (entorno Uhuu, host de GitHub o del cliente) y se
+reutiliza entre llamadas de una misma ejecución y entre ejecuciones del cron en el mismo worker.
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 10
+
+_lock = threading.Lock()
+_sesiones = {}  # clave -> (requests.Session, pool_maxsize)
+
+
+# Tiempos de conexión (DNS + TCP) y TLS de la petición en curso en cada hilo; con keep-alive son 0
+_medicion = threading.local()
+
+
+def iniciar_medicion():
+    _medicion.fases = {'connect': 0.0, 'tls': 0.0}
+
+
+def fases_medidas():
+    return dict(getattr(_medicion, 'fases', None) or {'connect': 0.0, 'tls': 0.0})
+
+
+def _sumar_fase(fase, segundos):
+    fases = getattr(_medicion, 'fases', None)
+    if fases is not None:
+        fases[fase] += segundos
+
+
+class _ConexionMedida:
+    def _new_conn(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _sumar_fase('connect', time.perf_counter() - inicio)
+
+    def connect(self):
+        fases = getattr(_medicion, 'fases', None)
+        previo = fases['connect'] if fases else 0.0
+        inicio = time.perf_counter()
+        super().connect()
+        if fases is not None and isinstance(self, HTTPSConnection):
+            # connect() = _new_conn() + handshake TLS
+            fases['tls'] += (time.perf_counter() - inicio) - (fases['connect'] - previo)
+
+
+class _HTTPConnectionMedida(_ConexionMedida, HTTPConnection):
+    pass
+
+
+class _HTTPSConnectionMedida(_ConexionMedida, HTTPSConnection):
+    pass
+
+
+class _HTTPConnectionPoolMedido(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnectionMedida
+
+
+class _HTTPSConnectionPoolMedido(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnectionMedida
+
+
+class _AdapterMedido(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _HTTPConnectionPoolMedido,
+            'https': _HTTPSConnectionPoolMedido,
+        }
+
+
+def nueva_sesion(pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    session = requests.Session()
+    adapter = _AdapterMedido(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(clave, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    pool_maxsize = max(int(pool_maxsize or DEFAULT_POOL_MAXSIZE), 1)
+    with _lock:
+        session, tamano = _sesiones.get(clave, (None, None))
+        if session is not None and tamano == pool_maxsize:
+            return session
+        if session is not None:
+            session.close()
+        session = nueva_sesion(pool_maxsize)
+        _sesiones[clave] = (session, pool_maxsize)
+        _logger.debug("🔌 Nueva sesión HTTP para %s (pool_maxsize=%s)", clave, pool_maxsize)
+        return session
+
+
+def clave_host(dbname, url):
+    partes = urlsplit(url)
+    return (dbname, 'host', f"{partes.scheme}://{partes.netloc}".lower())
+
+
+def clave_entorno(dbname, environment_id):
+    return (dbname, 'uhuu.api.environment', environment_id)
+
+
+def descartar(clave):
+    with _lock:
+        session, _tamano = _sesiones.pop(clave, (None, None))
+    if session is not None:
+        session.close()
+
+
+def descartar_todo():
+    with _lock:
+        sesiones = list(_sesiones.values())
+        _sesiones.clear()
+    for session, _tamano in sesiones:
+        session.close()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Generador de carga HTTP con hilos, rampa de arranque y límite opcional de peticiones por segundo.
+
+No usa el ORM: recibe una petición ya preparada y devuelve las muestras para que el modelo
+las resuma y guarde.
+"""
+import threading
+import time
+
+from . import http_pool
+
+
+class _Limitador:
+    # Reparte turnos equiespaciados entre todos los hilos para no superar ``rps``
+    def __init__(self, rps):
+        self.intervalo = 1.0 / rps if rps and rps > 0 else 0.0
+        self.siguiente = time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self.lock:
+            turno = max(self.siguiente, time.monotonic())
+            self.siguiente = turno + self.intervalo
+        pausa = turno - time.monotonic()
+        if pausa > 0:
+            time.sleep(pausa)
+
+
+def ejecutar_carga(peticion, concurrencia, duracion, ramp_up=0, rps=0, timeout=15):
+    """Lanza ``concurrencia`` hilos durante ``duracion`` segundos contra ``peticion``.
+
+    Los hilos arrancan escalonados a lo largo de ``ramp_up`` segundos. Devuelve
+    ``(muestras, tiempo_total)`` donde cada muestra es ``(status_code, segundos, error)``.
+    """
+    peticion = dict(peticion)
+    peticion.pop('session', None)
+    # La carga usa su propio timeout y no debe abrir el circuito del entorno
+    peticion.pop('timeout', None)
+    peticion.pop('circuito', None)
+    peticion.pop('registrar', None)
+    peticion.pop('limite_bytes', None)
+    concurrencia = max(int(concurrencia), 1)
+    session = http_pool.nueva_sesion(concurrencia)
+    limitador = _Limitador(rps)
+    muestras = []
+    lock_muestras = threading.Lock()
+    inicio = time.monotonic()
+    fin = inicio + duracion
+
+    def trabajador(indice):
+        retraso = ramp_up * indice / concurrencia if ramp_up else 0
+        if retraso:
+            time.sleep(retraso)
+        locales = []
+        while time.monotonic() < fin:
+            limitador.esperar()
+            if time.monotonic() >= fin:
+                break
+            t0 = time.perf_counter()
+            try:
+                response = session.request(timeout=timeout, **peticion)
+                response.content  # el tiempo incluye la descarga completa del cuerpo
+                locales.append((response.status_code, time.perf_counter() - t0, None))
+            except Exception as e:
+                locales.append((0, time.perf_counter() - t0, type(e).__name__))
+        with lock_muestras:
+            muestras.extend(locales)
+
+    hilos = [threading.Thread(target=trabajador, args=(i,), daemon=True) for i in range(concurrencia)]
+    try:
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join(timeout=max(fin - time.monotonic(), 0) + timeout + 1)
+    finally:
+        session.close()
+    return muestras, time.monotonic() - inicio
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Log de peticiones HTTP a nivel DEBUG, muestreado y sin secretos.
+
+Los mensajes solo se construyen si el logger tiene DEBUG activo y la petición entra en la muestra;
+se activa con ``--log-handler=odoo.addons.rs_admin_console.tools.request_log:DEBUG``.
+"""
+import json
+import logging
+import random
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_logger = logging.getLogger(__name__)
+
+CLAVES_SECRETAS = ('authorization', 'token', 'secret', 'password', 'passwd', 'api-key', 'api_key', 'apikey', 'cookie')
+REDACTADO = '***'
+
+
+def habilitado():
+    return _logger.isEnabledFor(logging.DEBUG)
+
+
+def en_muestra(muestreo):
+    return habilitado() and random.random() < muestreo
+
+
+def _es_secreta(clave):
+    clave = str(clave).lower()
+    return any(secreta in clave for secreta in CLAVES_SECRETAS)
+
+
+def redactar(valor):
+    if isinstance(valor, dict):
+        return {k: REDACTADO if _es_secreta(k) else redactar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [redactar(v) for v in valor]
+    return valor
+
+
+def redactar_url(url):
+    partes = urlsplit(url or '')
+    if not partes.query:
+        return url
+    query = [(k, REDACTADO if _es_secreta(k) else v) for k, v in parse_qsl(partes.query, keep_blank_values=True)]
+    return urlunsplit(partes._replace(query=urlencode(query)))
+
+
+def peticion(peticion):
+    _logger.debug("📤 %s", json.dumps({
+        'method': peticion.get('method'),
+        'url': redactar_url(peticion.get('url')),
+        'headers': redactar(peticion.get('headers') or {}),
+        'params': redactar(peticion.get('params')),
+        'body': redactar(peticion.get('json')),
+    }, default=str, ensure_ascii=False))
+
+
+def respuesta(peticion, resultado):
+    _logger.debug("📥 %s", json.dumps({
+        'method': peticion.get('method'),
+        'url': redactar_url(peticion.get('url')),
+        'status_code': resultado.get('status_code'),
+        'duration': resultado.get('duration'),
+        'timing_connect': resultado.get('timing_connect'),
+        'timing_tls': resultado.get('timing_tls'),
+        'timing_ttfb': resultado.get('timing_ttfb'),
+        'timing_transfer': resultado.get('timing_transfer'),
+    }, default=str, ensure_ascii=False))
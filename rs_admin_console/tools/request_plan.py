@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Compilación de endpoints en planes de petición inmutables, cacheados por proceso.
+
+El plan guarda headers, body y query params ya interpretados (y los params ya codificados),
+de modo que cada ejecución solo resuelve los placeholders ``{{partner.campo}}`` /
+``{{environment.campo}}`` sin volver a leer el JSON.
+"""
+import copy
+import json
+import logging
+import re
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+_logger = logging.getLogger(__name__)
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\.(\w+)\s*\}\}')
+RAICES_PLACEHOLDER = ('partner', 'environment')
+
+PlanPeticion = namedtuple('PlanPeticion', [
+    'method',  # 'GET', 'POST', ...
+    'ruta',  # ruta relativa al base_url del entorno, puede contener placeholders
+    'headers',  # MappingProxyType con las cabeceras base (sin Authorization del token)
+    'body',  # cuerpo JSON (dict, lista o escalar) para POST/PUT, o None; resolver() entrega una copia
+    'params',  # params ya codificados con json.dumps para GET/DELETE, o None
+    'placeholders',  # frozenset de ('partner'|'environment', campo) usados en el plan
+    'errores',  # tuple de mensajes de validación
+])
+
+_lock = threading.Lock()
+_planes = {}  # (dbname, endpoint_id) -> (plan_version, PlanPeticion)
+
+
+def _cargar_json(texto, nombre, errores, solo_diccionario=True):
+    # Cabeceras y parámetros deben ser diccionarios; el body admite cualquier valor JSON (p. ej. una lista)
+    try:
+        valor = json.loads(texto or "{}")
+    except Exception as e:
+        errores.append(f"{nombre}: JSON inválido ({e})")
+        return {}
+    if solo_diccionario and not isinstance(valor, dict):
+        errores.append(f"{nombre}: se esperaba un diccionario JSON")
+        return {}
+    return valor
+
+
+def _buscar_placeholders(valor, encontrados):
+    if isinstance(valor, str):
+        encontrados.update(PLACEHOLDER_RE.findall(valor))
+    elif isinstance(valor, dict):
+        for k, v in valor.items():
+            _buscar_placeholders(k, encontrados)
+            _buscar_placeholders(v, encontrados)
+    elif isinstance(valor, list):
+        for v in valor:
+            _buscar_placeholders(v, encontrados)
+    return encontrados
+
+
+def _sustituir(valor, valores):
+    if isinstance(valor, str):
+        return PLACEHOLDER_RE.sub(lambda m: str(valores.get((m.group(1), m.group(2)), '')), valor)
+    if isinstance(valor, dict):
+        return {_sustituir(k, valores): _sustituir(v, valores) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_sustituir(v, valores) for v in valor]
+    return valor
+
+
+def _codificar_params(query_params):
+    return {k: json.dumps(v) for k, v in query_params.items()}
+
+
+def compilar(method, route, headers, body_json, query_params):
+    errores = []
+    method = (method or '').upper()
+    headers_dict = _cargar_json(headers, 'Cabeceras', errores)
+    body = _cargar_json(body_json, 'Body', errores, solo_diccionario=False)
+    params = _cargar_json(query_params, 'Parámetros', errores)
+
+    # Validación preventiva para 'fields'
+    fields_list = params.get('fields', [])
+    if isinstance(fields_list, list):
+        for f in fields_list:
+            if isinstance(f, list):
+                _logger.warning("⚠️ 'fields' contiene una lista anidada. Corrígelo para evitar errores 500.")
+                params['fields'] = f
+                break
+
+    usa_body = method in ['POST', 'PUT']
+    usa_params = method in ['GET', 'DELETE']
+    placeholders = set()
+    _buscar_placeholders(route or '', placeholders)
+    _buscar_placeholders(headers_dict, placeholders)
+    if usa_body:
+        _buscar_placeholders(body, placeholders)
+    placeholders_params = _buscar_placeholders(params, set()) if usa_params else set()
+    placeholders |= placeholders_params
+    for raiz, campo in sorted(placeholders):
+        if raiz not in RAICES_PLACEHOLDER:
+            errores.append(f"Placeholder desconocido: {{{{{raiz}.{campo}}}}}")
+
+    if usa_params:
+        # Con placeholders los params se codifican al resolver; si no, una sola vez aquí
+        params = MappingProxyType(params if placeholders_params else _codificar_params(params))
+    return PlanPeticion(
+        method=method,
+        ruta=(route or '').lstrip('/'),
+        headers=MappingProxyType(headers_dict),
+        body=body if usa_body else None,
+        params=params if usa_params else None,
+        placeholders=frozenset(placeholders),
+        errores=tuple(errores),
+    )
+
+
+def obtener(dbname, endpoint_id, version, compilador):
+    clave = (dbname, endpoint_id)
+    with _lock:
+        version_cache, plan = _planes.get(clave, (None, None))
+    if plan is not None and version_cache == version:
+        return plan
+    plan = compilador()
+    for error in plan.errores:
+        _logger.warning("⚠️ Endpoint %s: %s", endpoint_id, error)
+    with _lock:
+        _planes[clave] = (version, plan)
+    return plan
+
+
+def descartar(dbname, endpoint_ids):
+    with _lock:
+        for endpoint_id in endpoint_ids:
+            _planes.pop((dbname, endpoint_id), None)
+
+
+def resolver(plan, base_url, valores=None):
+    """Construye los argumentos de la petición a partir del plan y los valores de placeholders.
+
+    Devuelve estructuras nuevas: modificar la petición no altera el plan cacheado del proceso.
+    """
+    valores = valores or {}
+    ruta, headers, body, params = plan.ruta, dict(plan.headers), plan.body, plan.params
+    if plan.placeholders:
+        # _sustituir ya construye diccionarios y listas nuevos
+        ruta = _sustituir(ruta, valores)
+        headers = _sustituir(headers, valores)
+        body = _sustituir(body, valores) if body is not None else None
+        if params is not None and _buscar_placeholders(dict(params), set()):
+            params = _codificar_params(_sustituir(dict(params), valores))
+    else:
+        body = copy.deepcopy(body)
+    return {
+        'method': plan.method,
+        'url': base_url.rstrip('/') + '/' + ruta,
+        'headers': headers,
+        'json': body,
+        'params': copy.deepcopy(dict(params)) if params is not None else None,
+    }
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Utilidades estadísticas sin dependencias externas."""
+
+
+def percentil(valores_ordenados, p):
+    """Percentil ``p`` (0-100) con interpolación lineal sobre una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    if len(valores_ordenados) == 1:
+        return float(valores_ordenados[0])
+    posicion = (len(valores_ordenados) - 1) * p / 100.0
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    fraccion = posicion - inferior
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * fraccion
+
+
+def resumen_latencias(duraciones):
+    ordenadas = sorted(duraciones)
+    if not ordenadas:
+        return {'min': 0.0, 'max': 0.0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p95': 0.0, 'p99': 0.0}
+    return {
+        'min': ordenadas[0],
+        'max': ordenadas[-1],
+        'mean': sum(ordenadas) / len(ordenadas),
+        'p50': percentil(ordenadas, 50),
+        'p90': percentil(ordenadas, 90),
+        'p95': percentil(ordenadas, 95),
+        'p99': percentil(ordenadas, 99),
+    }
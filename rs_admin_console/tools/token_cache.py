@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Caché por proceso de tokens de login (endpoint de login + entorno) con expiración."""
+import base64
+import json
+import threading
+import time
+
+_lock = threading.Lock()
+_tokens = {}  # (dbname, login_endpoint_id, environment_id) -> (token, expira_en)
+
+
+def clave(dbname, login_endpoint_id, environment_id):
+    return (dbname, login_endpoint_id, environment_id)
+
+
+def obtener(clave_token, margen=0):
+    # Un token que expira dentro del margen se considera vencido para forzar su renovación
+    with _lock:
+        token, expira_en = _tokens.get(clave_token, (None, 0))
+    if token and expira_en - margen > time.time():
+        return token
+    return None
+
+
+def guardar(clave_token, token, expira_en):
+    with _lock:
+        _tokens[clave_token] = (token, expira_en)
+
+
+def invalidar(dbname, login_endpoint_ids=None, environment_ids=None):
+    with _lock:
+        for db, endpoint_id, environment_id in list(_tokens):
+            if db != dbname:
+                continue
+            if login_endpoint_ids is not None and endpoint_id not in login_endpoint_ids:
+                continue
+            if environment_ids is not None and environment_id not in environment_ids:
+                continue
+            del _tokens[(db, endpoint_id, environment_id)]
+
+
+def _exp_jwt(token):
+    # Lee el claim 'exp' de un JWT sin verificar la firma; solo se usa para calcular la caducidad
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload)).get('exp'))
+    except Exception:
+        return None
+
+
+def extraer_token(texto, ttl_defecto):
+    """Devuelve ``(token, expira_en)`` a partir del cuerpo de respuesta del login.
+
+    La expiración se toma de ``expires_in``, ``expires_at``/``exp`` o del claim ``exp`` del JWT;
+    si no viene en la respuesta se usa ``ttl_defecto`` (segundos). Lanza ValueError si no hay token.
+    """
+    data = json.loads(texto or '{}')
+    token = data.get('access_token') or data.get('token')
+    if not token:
+        raise ValueError("No se pudo obtener token del login.")
+
+    ahora = time.time()
+    expira_en = None
+    try:
+        if data.get('expires_in'):
+            expira_en = ahora + float(data['expires_in'])
+        elif data.get('expires_at') or data.get('exp'):
+            expira_en = float(data.get('expires_at') or data.get('exp'))
+    except (TypeError, ValueError):
+        expira_en = None
+    if expira_en is None:
+        expira_en = _exp_jwt(token)
+    if expira_en is None:
+        expira_en = ahora + ttl_defecto
+    return token, expira_en